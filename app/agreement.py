@@ -0,0 +1,250 @@
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+from app import annotations
+
+# 标注一致性分析：annotation_archive -> annotation_votes（增量抽取）-> NumPy 计算 -> 物化表
+AGREEMENT_BATCH = int(os.environ.get("AGREEMENT_BATCH", "2000"))
+
+
+# -----------------------------
+# 增量抽取：只解压 watermark 之后的新归档
+# -----------------------------
+def extract_votes(conn, dataset_id: int, watermark: int) -> tuple:
+    """
+    返回 (新 watermark, 处理的归档行数)。同一个 task 有多个新归档时以最新一条为准
+    """
+    processed = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, task_id, payload FROM annotation_archive "
+                 "WHERE dataset_id = :d AND id > :w ORDER BY id LIMIT :n"),
+            {"d": dataset_id, "w": watermark, "n": AGREEMENT_BATCH},
+        ).all()
+        if not rows:
+            return watermark, processed
+
+        latest = {}
+        for archive_id, task_id, payload in rows:
+            latest[task_id] = annotations.votes(annotations.unpack(payload))
+        task_ids = list(latest)
+        conn.execute(
+            text("DELETE FROM annotation_votes WHERE dataset_id = :d AND task_id = ANY(:ids)"),
+            {"d": dataset_id, "ids": task_ids},
+        )
+        values = [
+            {"t": task_id, "a": who, "d": dataset_id, "l": label}
+            for task_id, per_task in latest.items()
+            for who, label in per_task.items()
+        ]
+        if values:
+            conn.execute(
+                text("INSERT INTO annotation_votes (task_id, annotator, dataset_id, label) VALUES (:t, :a, :d, :l)"),
+                values,
+            )
+        watermark = rows[-1][0]
+        processed += len(rows)
+
+
+def load_votes(conn, dataset_id: int) -> tuple:
+    """
+    返回 (task_ids int64[V], ann_idx int64[V], lab_idx int64[V], annotator 名单, label 名单)
+    字符串先在库里映射成下标，再以定长二进制整列返回，和 sampling.load_candidates 同一个思路
+    """
+    names = conn.execute(
+        text("SELECT DISTINCT annotator FROM annotation_votes WHERE dataset_id = :d ORDER BY 1"),
+        {"d": dataset_id},
+    ).scalars().all()
+    labels = conn.execute(
+        text("SELECT DISTINCT label FROM annotation_votes WHERE dataset_id = :d ORDER BY 1"),
+        {"d": dataset_id},
+    ).scalars().all()
+    row = conn.execute(
+        text("""
+            SELECT count(*),
+                   string_agg(int4send(task_id), ''),
+                   string_agg(int4send(array_position(CAST(:names AS text[]), annotator::text) - 1), ''),
+                   string_agg(int4send(array_position(CAST(:labels AS text[]), label::text) - 1), '')
+            FROM annotation_votes WHERE dataset_id = :d
+        """),
+        {"d": dataset_id, "names": list(names), "labels": list(labels)},
+    ).one()
+    if not row[0]:
+        empty = np.empty(0, np.int64)
+        return empty, empty, empty, list(names), list(labels)
+    cols = [np.frombuffer(b, dtype=">i4").astype(np.int64) for b in row[1:]]
+    return cols[0], cols[1], cols[2], list(names), list(labels)
+
+
+# -----------------------------
+# 向量化计算
+# -----------------------------
+def _nan_to_none(x):
+    x = float(x)
+    return None if np.isnan(x) else round(x, 6)
+
+
+def fleiss_kappa(counts: np.ndarray) -> float:
+    """
+    counts: (T, L) 每个 task 各标签票数，只传 >=2 票的 task；允许每个 task 票数不同
+    """
+    n = counts.sum(axis=1).astype(np.float64)
+    if counts.shape[0] == 0:
+        return float("nan")
+    p_i = ((counts.astype(np.float64) ** 2).sum(axis=1) - n) / (n * (n - 1))
+    p_bar = p_i.mean()
+    p_j = counts.sum(axis=0) / n.sum()
+    p_e = float((p_j ** 2).sum())
+    if p_e >= 1.0:
+        # 所有票都是同一个标签：kappa 无定义
+        return float("nan")
+    return (p_bar - p_e) / (1.0 - p_e)
+
+
+def pairwise_cohen(t_idx: np.ndarray, a_idx: np.ndarray, l_idx: np.ndarray, n_ann: int, n_lab: int) -> tuple:
+    """
+    所有标注员两两的 Cohen's kappa，返回 (kappa[A, A], shared[A, A])
+
+    按 task 分组后一次性展开组内所有有序票对，bincount 出 (A*L) x (A*L) 的联合计数，不做 Python 循环
+    """
+    order = np.argsort(t_idx, kind="stable")
+    t, code = t_idx[order], (a_idx * n_lab + l_idx)[order]
+    v = t.shape[0]
+    size = np.bincount(t)[t]                      # 每张票所在 task 的票数
+    start = np.searchsorted(t, t)                 # 所在 task 第一张票的位置
+    left = np.repeat(np.arange(v), size)
+    offset = np.arange(left.shape[0]) - np.repeat(np.cumsum(size) - size, size)
+    right = np.repeat(start, size) + offset
+    keep = left != right
+    al = n_ann * n_lab
+    joint = np.bincount(code[left[keep]] * al + code[right[keep]], minlength=al * al)
+    m = joint.reshape(n_ann, n_lab, n_ann, n_lab).transpose(0, 2, 1, 3).astype(np.float64)  # (A, A, L, L)
+
+    shared = m.sum(axis=(2, 3))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        po = np.trace(m, axis1=2, axis2=3) / shared
+        pa = m.sum(axis=3) / shared[..., None]
+        pb = m.sum(axis=2) / shared[..., None]
+        pe = (pa * pb).sum(axis=2)
+        kappa = (po - pe) / (1.0 - pe)
+    kappa[(shared == 0) | (pe >= 1.0)] = np.nan
+    return kappa, shared.astype(np.int64)
+
+
+def compute(task_ids: np.ndarray, a_idx: np.ndarray, l_idx: np.ndarray, n_ann: int, n_lab: int) -> dict:
+    """
+    纯数组计算（bench 直接调）：返回 dataset 级指标 + 每个标注员（按下标）的指标
+    """
+    if task_ids.shape[0] == 0:
+        return {"dataset": {"voted_tasks": 0, "multi_voted_tasks": 0, "annotators": 0, "fleiss_kappa": None,
+                            "mean_cohen_kappa": None, "majority_confidence": None, "unanimous_ratio": None},
+                "annotators": []}
+
+    _, t_idx = np.unique(task_ids, return_inverse=True)
+    n_task = int(t_idx.max()) + 1
+    counts = np.bincount(t_idx * n_lab + l_idx, minlength=n_task * n_lab).reshape(n_task, n_lab)
+    n_i = counts.sum(axis=1)
+    multi = n_i >= 2
+    mx = counts.max(axis=1)
+
+    kappa, shared = pairwise_cohen(t_idx, a_idx, l_idx, n_ann, n_lab)
+    upper = np.triu(np.ones((n_ann, n_ann), dtype=bool), k=1) & ~np.isnan(kappa)
+    mean_cohen = (kappa[upper] * shared[upper]).sum() / shared[upper].sum() if upper.any() else float("nan")
+
+    # 留一法：去掉自己这一票后，自己的标签是否仍在多数票里（并列也算）
+    vote_multi = multi[t_idx]
+    others = counts[t_idx].copy()
+    rows = np.arange(others.shape[0])
+    others[rows, l_idx] -= 1
+    agree = (others[rows, l_idx] == others.max(axis=1)) & vote_multi
+
+    votes_per = np.bincount(a_idx, minlength=n_ann)
+    shared_per = np.bincount(a_idx, weights=vote_multi, minlength=n_ann).astype(np.int64)
+    agree_per = np.bincount(a_idx, weights=agree, minlength=n_ann)
+    valid = ~np.isnan(kappa)
+    w = np.where(valid, shared, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cohen_per = (np.where(valid, kappa, 0.0) * w).sum(axis=1) / w.sum(axis=1)
+        majority_per = agree_per / shared_per
+
+    return {
+        "dataset": {
+            "voted_tasks": n_task,
+            "multi_voted_tasks": int(multi.sum()),
+            "annotators": n_ann,
+            "fleiss_kappa": _nan_to_none(fleiss_kappa(counts[multi])),
+            "mean_cohen_kappa": _nan_to_none(mean_cohen),
+            "majority_confidence": _nan_to_none((mx[multi] / n_i[multi]).mean()) if multi.any() else None,
+            "unanimous_ratio": _nan_to_none((mx[multi] == n_i[multi]).mean()) if multi.any() else None,
+        },
+        "annotators": [
+            {
+                "votes": int(votes_per[a]),
+                "shared_tasks": int(shared_per[a]),
+                "cohen_kappa": _nan_to_none(cohen_per[a]),
+                "majority_agreement": _nan_to_none(majority_per[a]),
+            }
+            for a in range(n_ann)
+        ],
+    }
+
+
+# -----------------------------
+# 物化
+# -----------------------------
+def refresh(conn, dataset_id: int, force: bool = False) -> dict:
+    """
+    增量抽取新归档并重算、写入 dataset_agreement / annotator_agreement。
+    没有新归档且已经算过时直接返回（force=True 强制重算）
+
+    增量只到 annotation_votes 这一层：指标每次从该 dataset 的全部票重新算。重标注的 task 会替换旧票，
+    两两联合计数要先减掉旧票再加新票，kappa 的边际分布也跟着变，维护增量计数不比重算省多少；
+    重算只读定长整数列 + 几次 bincount（300 万票约 1.2 s，见 bench/bench_agreement.py）
+    """
+    # 同一 dataset 同时只允许一个计算，也和写归档的事务互斥（见 annotations.lock_archive）
+    annotations.lock_archive(conn, dataset_id)
+    prev = conn.execute(
+        text("SELECT archive_watermark FROM dataset_agreement WHERE dataset_id = :d"), {"d": dataset_id}
+    ).scalar()
+    watermark, processed = extract_votes(conn, dataset_id, prev or 0)
+    if prev is not None and processed == 0 and not force:
+        return {"processed": 0, "recomputed": False}
+
+    task_ids, a_idx, l_idx, names, labels = load_votes(conn, dataset_id)
+    result = compute(task_ids, a_idx, l_idx, len(names), len(labels))
+    now = datetime.utcnow()
+
+    conn.execute(
+        text("""
+            INSERT INTO dataset_agreement (dataset_id, archive_watermark, voted_tasks, multi_voted_tasks, annotators,
+                                           fleiss_kappa, mean_cohen_kappa, majority_confidence, unanimous_ratio, computed_at)
+            VALUES (:dataset_id, :archive_watermark, :voted_tasks, :multi_voted_tasks, :annotators,
+                    :fleiss_kappa, :mean_cohen_kappa, :majority_confidence, :unanimous_ratio, :computed_at)
+            ON CONFLICT (dataset_id) DO UPDATE SET
+                archive_watermark = EXCLUDED.archive_watermark,
+                voted_tasks = EXCLUDED.voted_tasks,
+                multi_voted_tasks = EXCLUDED.multi_voted_tasks,
+                annotators = EXCLUDED.annotators,
+                fleiss_kappa = EXCLUDED.fleiss_kappa,
+                mean_cohen_kappa = EXCLUDED.mean_cohen_kappa,
+                majority_confidence = EXCLUDED.majority_confidence,
+                unanimous_ratio = EXCLUDED.unanimous_ratio,
+                computed_at = EXCLUDED.computed_at
+        """),
+        {"dataset_id": dataset_id, "archive_watermark": watermark, "computed_at": now, **result["dataset"]},
+    )
+    conn.execute(text("DELETE FROM annotator_agreement WHERE dataset_id = :d"), {"d": dataset_id})
+    if names:
+        conn.execute(
+            text("""
+                INSERT INTO annotator_agreement (dataset_id, annotator, votes, shared_tasks, cohen_kappa,
+                                                 majority_agreement, computed_at)
+                VALUES (:dataset_id, :annotator, :votes, :shared_tasks, :cohen_kappa, :majority_agreement, :computed_at)
+            """),
+            [{"dataset_id": dataset_id, "annotator": name, "computed_at": now, **row}
+             for name, row in zip(names, result["annotators"])],
+        )
+    return {"processed": processed, "recomputed": True, **result["dataset"]}
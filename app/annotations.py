@@ -0,0 +1,108 @@
+import json
+import zlib
+import hashlib
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+# tasks 表只存最新一次标注的紧凑字段；完整 annotations 数组压缩后追加到 annotation_archive
+ARCHIVE_LEVEL = 6
+
+# 写归档的事务（export_from_ls / compact_annotations）和 agreement.refresh 共用的 advisory lock（第一个 key）
+ARCHIVE_LOCK_NS = 3401
+
+
+def _canonical(anns: list) -> bytes:
+    return json.dumps(anns, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def digest(anns: list) -> str:
+    """
+    annotations 内容指纹：LS 没改过的 task 重复导出时不再写归档
+    """
+    return hashlib.sha1(_canonical(anns)).hexdigest()
+
+
+def pack(anns: list) -> bytes:
+    return zlib.compress(_canonical(anns), ARCHIVE_LEVEL)
+
+
+def unpack(payload: bytes) -> list:
+    return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+
+def lock_archive(conn, dataset_id: int):
+    """
+    事务级锁，提交 / 回滚时释放。写归档的事务在插入前拿锁、一直持有到提交：
+    归档 id 在插入时就分配，但提交顺序不一定和 id 顺序一致；refresh 也拿这把锁，
+    拿到时比它读到的 id 小的归档都已经提交，按 id 推进 watermark 不会漏掉晚提交的小 id
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:ns, :d)"), {"ns": ARCHIVE_LOCK_NS, "d": dataset_id})
+
+
+def _parse_ts(value) -> datetime | None:
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # 库里统一存 naive UTC（和 datetime.utcnow 一致）
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _annotator(completed_by) -> str | None:
+    # 不同 LS 版本：completed_by 可能是 user id，也可能是 {"id":..,"email":..}
+    if isinstance(completed_by, dict):
+        v = completed_by.get("email") or completed_by.get("username") or completed_by.get("id")
+        return str(v) if v is not None else None
+    if completed_by is None:
+        return None
+    return str(completed_by)
+
+
+def compact_fields(anns: list) -> dict:
+    """
+    取最后一次标注（和 _extract_label_from_ls_task 一致）生成 tasks 上的紧凑列
+    """
+    last = anns[-1] if anns and isinstance(anns[-1], dict) else {}
+    lead_time = last.get("lead_time")
+    return {
+        "annotator": _annotator(last.get("completed_by")),
+        "annotated_at": _parse_ts(last.get("updated_at") or last.get("created_at")),
+        "lead_time": float(lead_time) if isinstance(lead_time, (int, float)) else None,
+        "annotation_count": len(anns),
+    }
+
+
+def choice_label(ann: dict) -> str | None:
+    """
+    单条标注里的 Choices 标签（单选取第一个），结构同 _extract_label_from_ls_task
+    """
+    results = ann.get("result") or []
+    if not isinstance(results, list):
+        return None
+    for r in results:
+        if not isinstance(r, dict):
+            continue
+        v = r.get("value") or {}
+        if isinstance(v, dict) and isinstance(v.get("choices"), list) and v["choices"]:
+            return str(v["choices"][0])
+    return None
+
+
+def votes(anns: list) -> dict:
+    """
+    {annotator: label}：每个标注员只算最后一次有效标注（跳过 was_cancelled / 没有 choices 的）
+    """
+    out = {}
+    for a in anns:
+        if not isinstance(a, dict) or a.get("was_cancelled"):
+            continue
+        who = _annotator(a.get("completed_by"))
+        label = choice_label(a)
+        if who is not None and label is not None:
+            out[who] = label
+    return out
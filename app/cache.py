@@ -0,0 +1,172 @@
+import os
+import json
+
+import redis
+
+# 读穿缓存（read-through）：热点读接口先查 Redis，miss 再查 Postgres 并回填
+# 写路径（assign / import / export / job 状态变化）负责显式失效
+# 缓存最好单独用一个 Redis DB（docker-compose 里是 /2），不和 Celery broker（/0）/ result backend（/1）混在一起
+REDIS_URL = os.environ.get("CACHE_REDIS_URL") or os.environ.get("REDIS_URL")
+CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "30"))
+CACHE_PREFIX = "cache:"
+STATS_KEY = "cache:stats"
+# 按组失效用的代数计数器：key 里带上当前代数，失效时 INCR，旧 key 不再被读到、等 TTL 过期
+GEN_PREFIX = "cache:gen:"
+
+_CLIENT = {"conn": None}
+
+
+def redis_client():
+    """
+    懒加载 Redis 连接；REDIS_URL 为空时返回 None（缓存整体关闭）
+    """
+    if not REDIS_URL:
+        return None
+    if _CLIENT["conn"] is None:
+        _CLIENT["conn"] = redis.Redis.from_url(
+            REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+        )
+    return _CLIENT["conn"]
+
+
+def _count(endpoint: str, outcome: str):
+    try:
+        redis_client().hincrby(STATS_KEY, f"{endpoint}:{outcome}", 1)
+    except redis.RedisError:
+        pass
+
+
+def cached(endpoint: str, key: str, loader, ttl: int = CACHE_TTL_SECONDS):
+    """
+    读穿缓存：
+    - hit：直接返回 Redis 里的 JSON
+    - miss：调用 loader() 查库，结果写回 Redis（带 TTL）
+    - Redis 不可用：退化成直接查库，不影响接口可用性
+    loader 抛出的异常（例如 404）不会被缓存；key 为 None 时不走缓存
+    """
+    conn = redis_client()
+    if conn is None or key is None:
+        return loader()
+
+    full_key = CACHE_PREFIX + key
+    try:
+        raw = conn.get(full_key)
+    except redis.RedisError:
+        return loader()
+
+    if raw is not None:
+        _count(endpoint, "hit")
+        return json.loads(raw)
+
+    _count(endpoint, "miss")
+    value = loader()
+    try:
+        conn.set(full_key, json.dumps(value), ex=ttl)
+    except redis.RedisError:
+        pass
+    return value
+
+
+def invalidate(*keys: str):
+    conn = redis_client()
+    if conn is None or not keys:
+        return
+    try:
+        conn.delete(*[CACHE_PREFIX + k for k in keys])
+    except redis.RedisError:
+        pass
+
+
+def _generations(*groups: str) -> list | None:
+    """
+    读各组当前代数（一次 MGET）；Redis 不可用时返回 None
+    """
+    conn = redis_client()
+    if conn is None:
+        return None
+    try:
+        return [int(v or 0) for v in conn.mget([GEN_PREFIX + g for g in groups])]
+    except redis.RedisError:
+        return None
+
+
+def bump_generation(group: str):
+    """
+    整组失效：O(1) 的 INCR，不需要 SCAN 找 key
+    """
+    conn = redis_client()
+    if conn is None:
+        return
+    try:
+        conn.incr(GEN_PREFIX + group)
+    except redis.RedisError:
+        pass
+
+
+def cache_stats() -> dict:
+    """
+    每个 endpoint 的 hit/miss 计数 + 命中率
+    """
+    conn = redis_client()
+    if conn is None:
+        return {"enabled": False, "endpoints": {}}
+    try:
+        raw = conn.hgetall(STATS_KEY)
+    except redis.RedisError:
+        return {"enabled": True, "error": "redis unavailable", "endpoints": {}}
+
+    endpoints = {}
+    for k, v in raw.items():
+        name, _, outcome = k.decode("utf-8").rpartition(":")
+        endpoints.setdefault(name, {"hit": 0, "miss": 0})[outcome] = int(v)
+    for v in endpoints.values():
+        total = v["hit"] + v["miss"]
+        v["hit_ratio"] = round(v["hit"] / total, 4) if total else 0.0
+    return {"enabled": True, "ttl_seconds": CACHE_TTL_SECONDS, "endpoints": endpoints}
+
+
+# -----------------------------
+# key 约定 + 按业务对象失效
+# -----------------------------
+def dataset_key(dataset_id: int) -> str:
+    return f"dataset:{dataset_id}"
+
+
+def dataset_stats_key(dataset_id: int) -> str:
+    return f"dataset_stats:{dataset_id}"
+
+
+def dataset_agreement_key(dataset_id: int) -> str:
+    return f"dataset_agreement:{dataset_id}"
+
+
+def job_key(job_id: int) -> str:
+    return f"job:{job_id}"
+
+
+def annotator_stats_key(username: str, dataset_id) -> str | None:
+    """
+    key 带全员代数和这个人的代数，任一失效后旧 key 都不会再命中；读不到代数时返回 None（直接查库）
+    """
+    gens = _generations("annotator_stats", f"annotator_stats:{username}")
+    if gens is None:
+        return None
+    return f"annotator_stats:v{gens[0]}.{gens[1]}:{username}:{dataset_id if dataset_id is not None else 'all'}"
+
+
+def invalidate_dataset(dataset_id: int):
+    invalidate(dataset_key(dataset_id), dataset_stats_key(dataset_id), dataset_agreement_key(dataset_id))
+
+
+def invalidate_job(job_id: int):
+    invalidate(job_key(job_id))
+
+
+def invalidate_annotator_stats(username: str | None = None):
+    """
+    username 为空时失效所有人的 stats（import/export 会批量改 status）
+    """
+    if username:
+        bump_generation(f"annotator_stats:{username}")
+    else:
+        bump_generation("annotator_stats")
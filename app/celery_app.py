@@ -2,13 +2,18 @@ import os
 import time
 import json
 import base64
+import logging
 import requests
 from celery import Celery
-from sqlalchemy import select, func, update
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_shutdown
+from sqlalchemy import select, func, update, null
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 from requests.exceptions import ReadTimeout, RequestException  # ← 新增这一行
-from app.models import Dataset, Task, Job
+from app.models import Dataset, Task, Job, AnnotationArchive
+from app import annotations, cache, exports, lifecycle, metrics, partitioning, profiling
+
+log = logging.getLogger(__name__)
 
 BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://redis:6379/0")
 RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
@@ -17,9 +22,31 @@ celery = Celery("aiplatform", broker=BROKER_URL, backend=RESULT_BACKEND)
 celery.conf.broker_connection_retry_on_startup = (
     os.environ.get("CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP", "true").lower() == "true"
 )
+# export_from_ls 写入新归档后自动排一个 compute_agreement
+AGREEMENT_ON_EXPORT = os.environ.get("AGREEMENT_ON_EXPORT", "true").lower() == "true"
+# 导入后翻页拉新任务时每页条数
+LS_LIST_PAGE_SIZE = int(os.environ.get("LS_LIST_PAGE_SIZE", "1000"))
 # 进程内缓存 access：避免频繁 refresh
 _ACCESS_CACHE = {"token": None, "exp_at": 0}
 
+metrics.install_db_hooks()
+profiling.install_db_hooks()
+task_prerun.connect(profiling.task_prerun)
+task_postrun.connect(profiling.task_postrun)
+
+
+@worker_init.connect
+def _start_metrics_exporter(**kwargs):
+    metrics.reset_multiproc_dir()
+    # WORKER_METRICS_PORT=0 关闭 worker 侧 exporter
+    if metrics.WORKER_METRICS_PORT:
+        metrics.start_worker_exporter()
+
+
+@worker_process_shutdown.connect
+def _cleanup_metrics(pid=None, **kwargs):
+    metrics.mark_process_dead(pid or os.getpid())
+
 
 @celery.task(name="ping")
 def ping():
@@ -85,12 +112,18 @@ def _fetch_access_token() -> str:
 
     for path in ("/api/token/refresh", "/api/token/refresh/"):
         url = base + path
-        r = requests.post(
-            url,
-            headers={"Content-Type": "application/json", "Accept": "application/json"},
-            json={"refresh": refresh},
-            timeout=30,
-        )
+        start = time.perf_counter()
+        status = "error"
+        try:
+            r = requests.post(
+                url,
+                headers={"Content-Type": "application/json", "Accept": "application/json"},
+                json={"refresh": refresh},
+                timeout=30,
+            )
+            status = str(r.status_code)
+        finally:
+            metrics.LS_TOKEN_REFRESH_SECONDS.labels(status).observe(time.perf_counter() - start)
         if r.ok:
             data = r.json() if r.text else {}
             access = (data.get("access") or "").strip()
@@ -141,15 +174,31 @@ def _ls_headers(force_refresh: bool = False):
     }
 
 
+def _timed_request(method: str, url: str, **kwargs) -> requests.Response:
+    """
+    每次调用 LS 都记一条 latency（按 endpoint 模板 + status 分桶）
+    """
+    start = time.perf_counter()
+    status = "error"
+    try:
+        r = requests.request(method, url, **kwargs)
+        status = str(r.status_code)
+        return r
+    finally:
+        metrics.LS_REQUEST_SECONDS.labels(method, metrics.ls_endpoint(url), status).observe(
+            time.perf_counter() - start
+        )
+
+
 def _request(method: str, url: str, *, json_body=None, timeout=30):
     """
     统一请求封装：
     - 默认带 Bearer access
     - 若遇到 401，自动 refresh 再重试一次
     """
-    r = requests.request(method, url, headers=_ls_headers(), json=json_body, timeout=timeout)
+    r = _timed_request(method, url, headers=_ls_headers(), json=json_body, timeout=timeout)
     if r.status_code == 401:
-        r = requests.request(
+        r = _timed_request(
             method, url, headers=_ls_headers(force_refresh=True), json=json_body, timeout=timeout
         )
     return r
@@ -179,27 +228,44 @@ def _get_max_ls_task_id(ls_base: str, project_id: int) -> int:
     return 0
 
 
-def _list_new_tasks(ls_base: str, project_id: int, after_id: int, limit: int):
+def _list_new_tasks(ls_base: str, project_id: int, after_id: int) -> list:
     """
-    兜底方案：拉取最新任务并取 id > after_id 的那些。
-    如果这里 ReadTimeout，就返回空列表，让 job 仍然可以 success（只是 imported_tasks 可能为 0）。
+    按 id 倒序翻页，取出 id > after_id 的全部任务（含 data），直到翻到旧任务或最后一页
     """
-    url = f"{ls_base}/api/projects/{project_id}/tasks?ordering=-id&page_size=1000"
-    try:
-        r = _request("GET", url, timeout=120)  # 拉长一点，最多等 2 分钟
-    except ReadTimeout:
-        # 兜底：就当暂时拿不到，返回空列表
-        return []
-    except RequestException as e:
-        raise RuntimeError(f"list new tasks failed: {e}")
+    out = []
+    page = 1
+    while True:
+        url = f"{ls_base}/api/projects/{project_id}/tasks?ordering=-id&page_size={LS_LIST_PAGE_SIZE}&page={page}"
+        try:
+            r = _request("GET", url, timeout=120)  # 拉长一点，最多等 2 分钟
+        except RequestException as e:
+            raise RuntimeError(f"list new tasks failed: {e}")
+        # 翻过最后一页时 LS 返回 404
+        if r.status_code == 404 and page > 1:
+            return out
+        if not r.ok:
+            _raise_with_detail(r, "list new tasks failed")
+        data = r.json()
+        results = data["results"] if isinstance(data, dict) else data
+        new = [t for t in results if int(t["id"]) > after_id]
+        out.extend(new)
+        if len(new) < len(results) or len(results) < LS_LIST_PAGE_SIZE:
+            return out
+        page += 1
+
+
+def _match_created_tasks(tasks: list, dataset_id: int) -> dict:
+    """
+    {item_id: ls_task_id}：按我们写进 data 的 dataset_id / id 对应，不依赖 LS 返回顺序
+    （同一个 LS 项目里其他 dataset 同时导入的任务会被过滤掉）
+    """
+    out = {}
+    for t in tasks:
+        d = t.get("data") or {}
+        if d.get("dataset_id") == dataset_id and d.get("id") is not None:
+            out[int(d["id"])] = int(t["id"])
+    return out
 
-    if not r.ok:
-        _raise_with_detail(r, "list new tasks failed")
-    data = r.json()
-    results = data["results"] if isinstance(data, dict) else data
-    ids = [int(t["id"]) for t in results if int(t["id"]) > after_id]
-    ids = sorted(ids)
-    return ids[-limit:] if len(ids) > limit else ids
 
 def _extract_created_task_ids(resp_json):
     # list: [{id:..}, ...]
@@ -221,6 +287,28 @@ def _extract_created_task_ids(resp_json):
     return []
 
 
+def _commit_job(db: Session, job: Job):
+    """
+    提交事务后失效 /jobs/{id} 的缓存，保证轮询方能看到最新状态
+    """
+    db.commit()
+    cache.invalidate_job(job.id)
+
+
+class DatasetNotActive(RuntimeError):
+    pass
+
+
+def _ensure_active(conn, dataset_id: int):
+    """
+    写入前再确认一次 dataset 仍是 active（接口入队时查过，但排队期间可能开始了删除 / 归档 / 重置）；
+    datasets 行的共享锁持有到本事务提交，生命周期 job 要等这次写完才能抢到状态
+    """
+    status = lifecycle.lock_active(conn, dataset_id)
+    if status != "active":
+        raise DatasetNotActive(f"dataset {dataset_id} is {status or 'deleted'}")
+
+
 def _wait_import_complete(ls_base: str, project_id: int, import_id: int):
     status_url = f"{ls_base}/api/projects/{project_id}/import/{import_id}"
     for _ in range(60):  # 最多约 120 秒
@@ -253,23 +341,31 @@ def import_dataset_to_ls(job_id: int):
         if not ds:
             job.status = "failed"
             job.message = "dataset not found"
-            db.commit()
+            _commit_job(db, job)
             return {"ok": False, "error": "dataset not found"}
+        if ds.status != "active":
+            job.status = "failed"
+            job.message = f"dataset is {ds.status}"
+            _commit_job(db, job)
+            return {"ok": False, "error": job.message}
 
         job.status = "running"
-        db.commit()
+        _commit_job(db, job)
 
+        timer = metrics.PhaseTimer("import_to_ls")
         items = (ds.items_json or {}).get("items", [])
         if not items:
             job.status = "failed"
             job.message = "dataset has no items"
-            db.commit()
+            _commit_job(db, job)
             return {"ok": False, "error": "dataset has no items"}
 
-        payload = [{"data": {"text": it["text"]}} for it in items]
+        # data 里带上 dataset_id / item id，导入后按它对应回 item，不靠 LS 的返回顺序
+        payload = [{"data": {"text": it["text"], "id": it["id"], "dataset_id": ds.id}} for it in items]
 
         try:
             before_max_id = _get_max_ls_task_id(LS_BASE_URL, LS_PROJECT_ID)
+            timer.lap("fetch")
 
             # import 接口有的环境会要求末尾 /
             import_urls = [
@@ -303,26 +399,43 @@ def import_dataset_to_ls(job_id: int):
             if (not created_ids) and isinstance(resp, dict) and "import" in resp:
                 _wait_import_complete(LS_BASE_URL, LS_PROJECT_ID, int(resp["import"]))
 
-            # 兜底：如果响应里拿不到 ids，就用 max_id 拉列表
-            if not created_ids:
-                created_ids = _list_new_tasks(
-                    LS_BASE_URL, LS_PROJECT_ID, before_max_id, limit=len(items)
+            # 响应里直接带了完整 task 就用它，否则翻页拉 before_max_id 之后的新任务
+            created = resp if isinstance(resp, list) and all(isinstance(t, dict) and "data" in t for t in resp) else None
+            if not created:
+                created = _list_new_tasks(LS_BASE_URL, LS_PROJECT_ID, before_max_id)
+            mapping = _match_created_tasks(created, ds.id)
+            missing = [it.get("id") for it in items if it.get("id") not in mapping]
+            if missing or len(mapping) != len(items):
+                raise RuntimeError(
+                    f"LS import reconcile mismatch: {len(mapping)}/{len(items)} items matched, "
+                    f"missing item ids {missing[:10]}"
                 )
-
-            # 写回我们自己的 tasks 表
-            for tid in created_ids:
+            created_ids = [mapping[it["id"]] for it in items]
+            timer.lap("reconcile")
+
+            # 写回我们自己的 tasks 表（LS 里已经建好的 task 不会回滚，dataset 不再是 active 时 job 失败）
+            # 分区在建 dataset 时已经建好；reset 之后 / 开关打开前建的 dataset 在这里补上
+            _ensure_active(db.connection(), ds.id)
+            partitioning.ensure_partitions(db.connection(), ds.id)
+            for it, tid in zip(items, created_ids):
                 db.add(
                     Task(
                         dataset_id=ds.id,
                         ls_project_id=LS_PROJECT_ID,
                         ls_task_id=int(tid),
+                        item_id=it.get("id"),
+                        item_text=it.get("text"),
                         status="imported",
                     )
                 )
+            ds.version = Dataset.version + 1
 
             job.status = "success"
             job.message = f"imported {len(created_ids)} tasks"
-            db.commit()
+            _commit_job(db, job)
+            cache.invalidate_dataset(ds.id)
+            timer.lap("write")
+            timer.finish(len(created_ids))
 
             return {
                 "ok": True,
@@ -331,9 +444,13 @@ def import_dataset_to_ls(job_id: int):
             }
 
         except Exception as e:
+            timer.fail()
+            # 出错时事务可能已经 aborted，先回滚才能写 job 状态；写了一半的 tasks 一起丢弃
+            db.rollback()
             job.status = "failed"
             job.message = str(e)[:500]
-            db.commit()
+            _commit_job(db, job)
+            cache.invalidate_dataset(ds.id)
             return {"ok": False, "error": job.message}
 
 def _extract_label_from_ls_task(ls_task_json: dict) -> str | None:
@@ -365,6 +482,30 @@ def _extract_label_from_ls_task(ls_task_json: dict) -> str | None:
     return None
 
 
+def _apply_annotations(db: Session, t: Task, anns: list) -> bool:
+    """
+    annotations -> tasks 紧凑列 + annotation_archive（同内容不重复归档）；返回是否写了新归档
+    """
+    archived = False
+    d = annotations.digest(anns)
+    for k, v in annotations.compact_fields(anns).items():
+        setattr(t, k, v)
+    if t.annotation_digest != d:
+        db.add(AnnotationArchive(
+            task_id=t.id,
+            dataset_id=t.dataset_id,
+            ls_task_id=t.ls_task_id,
+            digest=d,
+            annotation_count=len(anns),
+            payload=annotations.pack(anns),
+        ))
+        t.annotation_digest = d
+        archived = True
+    # 旧数据的整块 JSONB 顺手清掉（null() 写 SQL NULL，None 会被存成 JSON 'null'）
+    t.annotation_json = null()
+    return archived
+
+
 @celery.task(name="export_dataset_from_ls")
 def export_dataset_from_ls(job_id: int):
     DATABASE_URL = os.environ["DATABASE_URL"]
@@ -380,17 +521,23 @@ def export_dataset_from_ls(job_id: int):
 
         dataset_id = job.dataset_id
         job.status = "running"
-        db.commit()
+        _commit_job(db, job)
 
+        timer = metrics.PhaseTimer("export_from_ls")
         try:
+            # 先拿归档锁、持有到提交：agreement 按 id 推进 watermark，不能有比它小的 id 晚提交
+            annotations.lock_archive(db.connection(), dataset_id)
             # 找出这个 dataset 的所有已导入任务（有 ls_task_id 才能拉回）
             rows = db.execute(
                 select(Task).where(Task.dataset_id == dataset_id, Task.ls_task_id.isnot(None))
             ).scalars().all()
+            timer.lap("fetch")
 
             exported = 0
+            archived = 0
 
             for t in rows:
+                timer.lap("reconcile")
                 url = f"{LS_BASE_URL}/api/tasks/{int(t.ls_task_id)}"
                 r = _request("GET", url, timeout=30)
                 if not r.ok:
@@ -398,13 +545,14 @@ def export_dataset_from_ls(job_id: int):
 
                 ls_task = r.json() if r.text else {}
                 anns = ls_task.get("annotations") or []
+                timer.lap("fetch")
 
                 # 没标注就跳过
                 if not anns:
                     continue
 
-                # 写回 annotation_json（你可以选择存最后一次或全部；这里存全部最安全）
-                t.annotation_json = {"annotations": anns}
+                # tasks 上只写紧凑列；完整 annotations 只在内容变化时追加到归档
+                archived += _apply_annotations(db, t, anns)
 
                 # 尝试提取 OK/NG
                 t.label = _extract_label_from_ls_task(ls_task)
@@ -413,13 +561,297 @@ def export_dataset_from_ls(job_id: int):
                 t.status = "labeled"
                 exported += 1
 
+            _ensure_active(db.connection(), dataset_id)
             job.status = "success"
+            timer.lap("reconcile")
+            if exported:
+                db.execute(
+                    update(Dataset).where(Dataset.id == dataset_id).values(version=Dataset.version + 1)
+                )
             job.message = f"exported {exported} labeled tasks"
-            db.commit()
-            return {"ok": True, "exported": exported}
+            _commit_job(db, job)
+            cache.invalidate_dataset(dataset_id)
+            cache.invalidate_annotator_stats()
+            timer.lap("write")
+            timer.finish(exported)
+
+        except Exception as e:
+            timer.fail()
+            # 出错时事务可能已经 aborted，先回滚才能写 job 状态。这一轮拉回的标注整批丢弃：
+            # dataset 已经在删除 / 归档 / 重置时本来就不能写；其他错误下次导出会重新拉全部任务
+            db.rollback()
+            job.status = "failed"
+            job.message = str(e)[:500]
+            _commit_job(db, job)
+            cache.invalidate_dataset(dataset_id)
+            cache.invalidate_annotator_stats()
+            return {"ok": False, "error": job.message}
+
+        # 有新标注进了归档：接着增量更新一致性指标。导出已经提交，排队失败只记在这个后续 job 上
+        if archived and AGREEMENT_ON_EXPORT:
+            _queue_followup_agreement(db, dataset_id, job.created_by)
+        return {"ok": True, "fetched": len(rows), "exported": exported, "archived": archived}
+
+
+def _queue_followup_agreement(db: Session, dataset_id: int, created_by: str) -> None:
+    follow = Job(type="agreement", status="queued", dataset_id=dataset_id, created_by=created_by)
+    try:
+        db.add(follow)
+        db.commit()
+    except Exception:
+        log.exception("create agreement job after export failed: dataset %s", dataset_id)
+        db.rollback()
+        return
+    try:
+        compute_agreement.delay(follow.id)
+    except Exception as e:
+        # broker 不可用：job 不会被执行，标成 failed，免得一直挂在 queued
+        log.exception("enqueue agreement job %s failed", follow.id)
+        follow.status = "failed"
+        follow.message = f"enqueue failed: {e}"[:500]
+        try:
+            _commit_job(db, follow)
+        except Exception:
+            log.exception("mark agreement job %s failed", follow.id)
+            db.rollback()
+
+
+@celery.task(name="compute_agreement")
+def compute_agreement(job_id: int, force: bool = False):
+    """
+    标注一致性（Fleiss / Cohen's kappa、多数票置信度）：只抽取上次之后的新归档，结果物化到
+    dataset_agreement / annotator_agreement
+    """
+    # numpy 只有这个任务用，worker 启动时不加载
+    from app import agreement
+
+    DATABASE_URL = os.environ["DATABASE_URL"]
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+    with Session(engine) as db:
+        job = db.get(Job, job_id)
+        if not job:
+            return {"ok": False, "error": "job not found"}
+
+        dataset_id = job.dataset_id
+        job.status = "running"
+        _commit_job(db, job)
+
+        timer = metrics.PhaseTimer("agreement")
+        try:
+            with engine.begin() as conn:
+                _ensure_active(conn, dataset_id)
+                result = agreement.refresh(conn, dataset_id, force=force)
+            timer.lap("compute")
+
+            job.status = "success"
+            if result["recomputed"]:
+                job.message = (
+                    f"processed {result['processed']} archived annotations, "
+                    f"fleiss_kappa={result['fleiss_kappa']}"
+                )
+            else:
+                job.message = "up to date"
+            _commit_job(db, job)
+            cache.invalidate(cache.dataset_agreement_key(dataset_id))
+            timer.finish(result["processed"])
+            return {"ok": True, **result}
 
         except Exception as e:
+            timer.fail()
             job.status = "failed"
             job.message = str(e)[:500]
+            _commit_job(db, job)
+            return {"ok": False, "error": job.message}
+
+
+COMPACT_BATCH = int(os.environ.get("COMPACT_BATCH", "1000"))
+
+
+@celery.task(name="compact_annotations")
+def compact_annotations(job_id: int):
+    """
+    存量数据迁移：把 tasks.annotation_json 拆成紧凑列 + 归档，按 id 分批提交
+    跑完后需要 VACUUM (FULL) tasks 才能把空间还给操作系统
+    """
+    DATABASE_URL = os.environ["DATABASE_URL"]
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+    with Session(engine) as db:
+        job = db.get(Job, job_id)
+        if not job:
+            return {"ok": False, "error": "job not found"}
+
+        dataset_id = job.dataset_id
+        job.status = "running"
+        _commit_job(db, job)
+
+        timer = metrics.PhaseTimer("compact_annotations")
+        compacted = 0
+        last_id = 0
+        try:
+            while True:
+                # 每批一个事务，每批都重新确认 dataset 状态、重新拿归档锁（同 export_from_ls）
+                _ensure_active(db.connection(), dataset_id)
+                annotations.lock_archive(db.connection(), dataset_id)
+                batch = db.execute(
+                    select(Task)
+                    .where(Task.dataset_id == dataset_id, Task.annotation_json.isnot(None), Task.id > last_id)
+                    .order_by(Task.id)
+                    .limit(COMPACT_BATCH)
+                ).scalars().all()
+                timer.lap("fetch")
+                if not batch:
+                    break
+
+                for t in batch:
+                    anns = (t.annotation_json or {}).get("annotations") or []
+                    if anns:
+                        _apply_annotations(db, t, anns)
+                    else:
+                        t.annotation_json = null()
+                    compacted += 1
+                last_id = batch[-1].id
+                job.message = f"compacted {compacted} tasks"
+                _commit_job(db, job)
+                # 每批清一次 identity map，内存只和 COMPACT_BATCH 有关
+                db.expunge_all()
+                job = db.get(Job, job_id)
+                timer.lap("write")
+
+            job.status = "success"
+            job.message = f"compacted {compacted} tasks"
+            _commit_job(db, job)
+            cache.invalidate_dataset(dataset_id)
+            timer.finish(compacted)
+            return {"ok": True, "compacted": compacted}
+
+        except Exception as e:
+            timer.fail()
+            db.rollback()
+            job = db.get(Job, job_id)
+            job.status = "failed"
+            job.message = str(e)[:500]
+            _commit_job(db, job)
+            return {"ok": False, "error": job.message}
+
+
+@celery.task(name="export_labeled_dataset")
+def export_labeled_dataset(job_id: int, fmt: str = "parquet", only_labeled: bool = True):
+    """
+    标注数据导出成 Parquet / NDJSON 文件（流式写，内存有界），产物按 dataset version 缓存
+    """
+    DATABASE_URL = os.environ["DATABASE_URL"]
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+    with Session(engine) as db:
+        job = db.get(Job, job_id)
+        if not job:
+            return {"ok": False, "error": "job not found"}
+
+        ds = db.get(Dataset, job.dataset_id)
+        if not ds:
+            job.status = "failed"
+            job.message = "dataset not found"
+            _commit_job(db, job)
+            return {"ok": False, "error": "dataset not found"}
+
+        version = ds.version
+        job.status = "running"
+        _commit_job(db, job)
+
+        timer = metrics.PhaseTimer("export_labeled")
+        try:
+            path, rows = exports.build_export(engine, ds.id, version, fmt, only_labeled)
+            timer.lap("write")
+
+            job.status = "success"
+            if rows is None:
+                job.message = f"up to date: {os.path.basename(path)}"
+            else:
+                job.message = f"exported {rows} rows to {os.path.basename(path)}"
+            _commit_job(db, job)
+            timer.finish(rows or 0)
+            return {"ok": True, "rows": rows, "version": version, "path": path}
+
+        except Exception as e:
+            timer.fail()
+            job.status = "failed"
+            job.message = str(e)[:500]
+            _commit_job(db, job)
+            return {"ok": False, "error": job.message}
+
+
+# -----------------------------
+# dataset 生命周期：删除 / 归档 / 重置（分批集合 SQL，见 app/lifecycle.py）
+# -----------------------------
+LIFECYCLE_OPS = {
+    "delete_dataset": lifecycle.delete_dataset,
+    "archive_dataset": lifecycle.archive_dataset,
+    "reset_dataset": lifecycle.reset_dataset,
+}
+
+
+def _run_lifecycle(job_id: int, op: str):
+    DATABASE_URL = os.environ["DATABASE_URL"]
+    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+    with Session(engine) as db:
+        job = db.get(Job, job_id)
+        if not job:
+            return {"ok": False, "error": "job not found"}
+
+        dataset_id = job.dataset_id
+        job.status = "running"
+        _commit_job(db, job)
+
+        def _progress(phase: str, done: int, total):
+            job.message = f"{phase}: {done}/{total}" if total else f"{phase}: {done}"
+            _commit_job(db, job)
+
+        timer = metrics.PhaseTimer(op)
+        try:
+            result = LIFECYCLE_OPS[op](engine, dataset_id, _progress)
+            timer.lap("write")
+
+            job.status = "success"
+            job.message = ", ".join(f"{k}={v}" for k, v in result.items())[:500]
+            _commit_job(db, job)
+            timer.finish(result.get("tasks", 0))
+            return {"ok": True, **result}
+
+        except Exception as e:
+            timer.fail()
+            db.rollback()
+            job = db.get(Job, job_id)
+            job.status = "failed"
+            job.message = str(e)[:500]
+            _commit_job(db, job)
+            # 已经删掉的批次不会回滚，不能回到 active：标成 <op>_failed，只有重试同一个操作能离开这个状态
+            busy_status, failed_status = lifecycle.OP_STATUS[op]
+            db.execute(
+                update(Dataset)
+                .where(Dataset.id == dataset_id, Dataset.status == busy_status)
+                .values(status=failed_status)
+            )
             db.commit()
-            return {"ok": False, "error": job.message}
\ No newline at end of file
+            return {"ok": False, "error": job.message}
+
+        finally:
+            cache.invalidate_dataset(dataset_id)
+            cache.invalidate_annotator_stats()
+
+
+@celery.task(name="delete_dataset")
+def delete_dataset(job_id: int):
+    return _run_lifecycle(job_id, "delete_dataset")
+
+
+@celery.task(name="archive_dataset")
+def archive_dataset(job_id: int):
+    return _run_lifecycle(job_id, "archive_dataset")
+
+
+@celery.task(name="reset_dataset")
+def reset_dataset(job_id: int):
+    return _run_lifecycle(job_id, "reset_dataset")
@@ -0,0 +1,86 @@
+import os
+import logging
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+# API 进程共用一个 engine：第一次有请求用到时才创建，import 时不碰数据库
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+
+# 启动时在后台线程建表（create_all + SCHEMA_PATCHES），Postgres 暂时连不上就退避重试，不挡 uvicorn 启动；
+# 扩容出来的副本可以设 SCHEMA_INIT_ON_STARTUP=false，跳过 DDL（ALTER TABLE 会短暂拿表锁）
+SCHEMA_INIT_ON_STARTUP = os.environ.get("SCHEMA_INIT_ON_STARTUP", "true").lower() == "true"
+SCHEMA_INIT_MAX_BACKOFF = float(os.environ.get("SCHEMA_INIT_MAX_BACKOFF", "30"))
+
+log = logging.getLogger(__name__)
+
+_ENGINE = {"engine": None}
+_LOCK = threading.Lock()
+SCHEMA_STATE = {"ready": False, "attempts": 0}
+
+
+def get_engine():
+    if _ENGINE["engine"] is None:
+        with _LOCK:
+            if _ENGINE["engine"] is None:
+                _ENGINE["engine"] = create_engine(
+                    os.environ["DATABASE_URL"],
+                    pool_pre_ping=True,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                )
+    return _ENGINE["engine"]
+
+
+def get_db():
+    with Session(get_engine()) as db:
+        yield db
+
+
+# -----------------------------
+# 建表 / 就绪检查
+# -----------------------------
+def _init_schema_with_retry(stop: threading.Event):
+    from app.models import init_schema
+
+    delay = 0.5
+    while not stop.is_set():
+        SCHEMA_STATE["attempts"] += 1
+        try:
+            init_schema(get_engine())
+            SCHEMA_STATE["ready"] = True
+            return
+        except Exception:
+            # 异常详情（连接串里的 host / 用户名等）只进服务端日志
+            log.exception("schema init failed (attempt %d), retry in %.1fs", SCHEMA_STATE["attempts"], delay)
+        stop.wait(delay)
+        delay = min(delay * 2, SCHEMA_INIT_MAX_BACKOFF)
+
+
+def start_schema_init() -> threading.Event:
+    """
+    返回 stop 事件（lifespan 结束时 set，停止重试）
+    """
+    stop = threading.Event()
+    if not SCHEMA_INIT_ON_STARTUP:
+        SCHEMA_STATE["ready"] = True
+        return stop
+    threading.Thread(target=_init_schema_with_retry, args=(stop,), name="schema-init", daemon=True).start()
+    return stop
+
+
+def readiness() -> dict:
+    """
+    /ready 用：表结构已就绪且现在能连上数据库。/ready 不需要登录，只返回原因代码，不带异常信息
+    """
+    if not SCHEMA_STATE["ready"]:
+        return {"ready": False, "reason": "schema_pending"}
+    try:
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception:
+        log.warning("readiness check: database unreachable", exc_info=True)
+        return {"ready": False, "reason": "db_unreachable"}
+    return {"ready": True}
@@ -1,6 +1,9 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+
 from app.auth import decode_token
+from app import lifecycle
 
 security = HTTPBearer(auto_error=False)
 
@@ -23,3 +26,14 @@ def require_role(*roles: str):
             raise HTTPException(status_code=403, detail="Forbidden")
         return user
     return _checker
+
+def require_active(db: Session, dataset_id: int):
+    """
+    写接口用：dataset 不存在 404；删除 / 归档 / 重置中或已归档 409。
+    datasets 行上的共享锁持有到调用方提交，期间生命周期 job 抢不到状态
+    """
+    status = lifecycle.lock_active(db.connection(), dataset_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    if status != "active":
+        raise HTTPException(status_code=409, detail=f"Dataset is {status}")
@@ -0,0 +1,141 @@
+import os
+import glob
+import json
+import tempfile
+
+from sqlalchemy import text
+
+# 导出产物放共享目录（api / worker 都挂同一个 volume），按 dataset version 缓存
+EXPORT_DIR = os.environ.get("EXPORT_DIR", "/data/exports")
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "50000"))
+FORMATS = {"parquet": "parquet", "ndjson": "ndjson"}
+
+# tasks 和 dataset items 做 join：items 在 datasets.items_json 里，展开一次后按 item_id hash join
+EXPORT_SQL = """
+WITH items AS (
+    SELECT (e->>'id')::int AS item_id, e->>'text' AS text
+    FROM datasets d, jsonb_array_elements(d.items_json->'items') AS e
+    WHERE d.id = :dataset_id
+)
+SELECT
+    t.id AS task_id,
+    t.ls_task_id,
+    t.item_id,
+    i.text,
+    t.label,
+    t.status,
+    t.assigned_to,
+    t.assigned_at,
+    t.annotator,
+    t.annotated_at,
+    t.lead_time,
+    t.annotation_count
+FROM tasks t
+LEFT JOIN items i ON i.item_id = t.item_id
+WHERE t.dataset_id = :dataset_id {where}
+ORDER BY t.id
+"""
+
+# 只导出紧凑列；完整 annotations 历史在 annotation_archive，按需通过 /tasks/{id}/annotations 取
+COLUMNS = [
+    "task_id", "ls_task_id", "item_id", "text", "label", "status", "assigned_to", "assigned_at",
+    "annotator", "annotated_at", "lead_time", "annotation_count",
+]
+_TIMESTAMP_COLUMNS = ("assigned_at", "annotated_at")
+
+
+def artifact_path(dataset_id: int, version: int, fmt: str, only_labeled: bool) -> str:
+    variant = "labeled" if only_labeled else "all"
+    return os.path.join(EXPORT_DIR, f"dataset_{dataset_id}", f"v{version}_{variant}.{FORMATS[fmt]}")
+
+
+def _prune_old_versions(dataset_id: int, keep_path: str, fmt: str, only_labeled: bool):
+    variant = "labeled" if only_labeled else "all"
+    pattern = os.path.join(EXPORT_DIR, f"dataset_{dataset_id}", f"v*_{variant}.{FORMATS[fmt]}")
+    for p in glob.glob(pattern):
+        if p != keep_path:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def _iter_batches(conn, dataset_id: int, only_labeled: bool):
+    """
+    server-side cursor 分批拉取，内存只和 EXPORT_BATCH_ROWS 有关
+    """
+    sql = EXPORT_SQL.format(where="AND t.status = 'labeled'" if only_labeled else "")
+    result = conn.execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS).execute(
+        text(sql), {"dataset_id": dataset_id}
+    )
+    for rows in result.partitions(EXPORT_BATCH_ROWS):
+        yield rows
+
+
+def _write_parquet(conn, dataset_id: int, only_labeled: bool, path: str) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("task_id", pa.int64()),
+        ("ls_task_id", pa.int64()),
+        ("item_id", pa.int64()),
+        ("text", pa.string()),
+        ("label", pa.string()),
+        ("status", pa.string()),
+        ("assigned_to", pa.string()),
+        ("assigned_at", pa.timestamp("us")),
+        ("annotator", pa.string()),
+        ("annotated_at", pa.timestamp("us")),
+        ("lead_time", pa.float64()),
+        ("annotation_count", pa.int32()),
+    ])
+    total = 0
+    # 每批写一个 row group，不需要把整张表攒在内存里
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in _iter_batches(conn, dataset_id, only_labeled):
+            cols = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema))
+            total += len(rows)
+    return total
+
+
+def _write_ndjson(conn, dataset_id: int, only_labeled: bool, path: str) -> int:
+    total = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in _iter_batches(conn, dataset_id, only_labeled):
+            lines = []
+            for r in rows:
+                obj = dict(zip(COLUMNS, r))
+                for k in _TIMESTAMP_COLUMNS:
+                    if obj[k] is not None:
+                        obj[k] = obj[k].isoformat()
+                lines.append(json.dumps(obj, ensure_ascii=False))
+            f.write("\n".join(lines) + "\n")
+            total += len(rows)
+    return total
+
+
+def build_export(engine, dataset_id: int, version: int, fmt: str, only_labeled: bool) -> tuple:
+    """
+    写导出文件并返回 (path, rows)。先写 .part 再原子 rename，下载方不会读到半个文件；
+    每次调用用自己的临时文件（同目录，rename 不跨文件系统），同一版本的两个 job 不会写进同一个 .part
+    """
+    path = artifact_path(dataset_id, version, fmt, only_labeled)
+    if os.path.exists(path):
+        return path, None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".part")
+    os.close(fd)
+    writer = _write_parquet if fmt == "parquet" else _write_ndjson
+    try:
+        with engine.connect() as conn:
+            rows = writer(conn, dataset_id, only_labeled, tmp)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, path)
+    _prune_old_versions(dataset_id, path, fmt, only_labeled)
+    return path, rows
@@ -0,0 +1,192 @@
+import os
+import gzip
+import json
+import zlib
+import shutil
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app import exports, partitioning
+
+# dataset 生命周期（删除 / 归档到冷存储 / 重置后重新导入）：全部是分批的集合 SQL，
+# 每批单独提交，避免长事务持锁、一次性写出大量 WAL
+LIFECYCLE_CHUNK = int(os.environ.get("LIFECYCLE_CHUNK", "5000"))
+COLD_STORAGE_DIR = os.environ.get("COLD_STORAGE_DIR", "/data/cold")
+# gzip 默认 9 级太慢，6 级体积差不多、速度快几倍
+COLD_GZIP_LEVEL = int(os.environ.get("COLD_GZIP_LEVEL", "6"))
+
+# 操作 -> (执行中的 status, 失败后的 status)。部分批次已经删掉的 dataset 不能回到 active 当作完整数据继续写，
+# 失败状态只能由同一个操作重试离开
+OP_STATUS = {
+    "delete_dataset": ("deleting", "delete_failed"),
+    "archive_dataset": ("archiving", "archive_failed"),
+    "reset_dataset": ("resetting", "reset_failed"),
+}
+
+# 先删派生表，最后删 tasks
+DERIVED_TABLES = ("annotation_votes", "annotator_agreement", "dataset_agreement", "annotation_archive")
+
+
+def _noop(phase: str, done: int, total: int | None):
+    pass
+
+
+def lock_active(conn, dataset_id: int) -> str | None:
+    """
+    写 dataset 的数据之前调用：SELECT ... FOR SHARE 锁住 datasets 行直到本事务结束，返回当前 status（不存在时 None）。
+    生命周期 job 抢状态的条件 UPDATE 会等这个事务提交；反过来已经不是 active 时调用方不应再写
+    """
+    return conn.execute(
+        text("SELECT status FROM datasets WHERE id = :d FOR SHARE"), {"d": dataset_id}
+    ).scalar()
+
+
+# -----------------------------
+# 分批删除
+# -----------------------------
+def delete_chunked(engine, table: str, dataset_id: int, progress=_noop, total: int | None = None) -> int:
+    """
+    每批 DELETE ... WHERE ctid = ANY(ARRAY(SELECT ctid ... LIMIT n)) 并提交；不经过 ORM，不加载行。
+    只用于没分区的表（ctid 只在单个分区内唯一，分区表走 partitioning.drop_partitions）
+    """
+    deleted = 0
+    sql = text(
+        f"DELETE FROM {table} WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {table} WHERE dataset_id = :d LIMIT :n))"
+    )
+    while True:
+        with engine.begin() as conn:
+            n = conn.execute(sql, {"d": dataset_id, "n": LIFECYCLE_CHUNK}).rowcount
+        if not n:
+            return deleted
+        deleted += n
+        progress(f"delete {table}", deleted, total)
+
+
+def purge(engine, dataset_id: int, progress=_noop) -> dict:
+    """
+    删除 dataset 下的 tasks 和所有派生数据，dataset 行本身保留。
+    按 dataset 分区的表直接 DETACH + DROP 分区，其余表分批 DELETE
+    """
+    counts = partitioning.drop_partitions(engine, dataset_id, progress)
+    with engine.connect() as conn:
+        total = conn.execute(text("SELECT count(*) FROM tasks WHERE dataset_id = :d"), {"d": dataset_id}).scalar_one()
+    for t in DERIVED_TABLES:
+        if t not in counts:
+            counts[t] = delete_chunked(engine, t, dataset_id, progress)
+    if "tasks" not in counts:
+        counts["tasks"] = delete_chunked(engine, "tasks", dataset_id, progress, total)
+    return counts
+
+
+# -----------------------------
+# 冷存储
+# -----------------------------
+def _stream(conn, sql: str, dataset_id: int):
+    result = conn.execution_options(stream_results=True, yield_per=LIFECYCLE_CHUNK).execute(
+        text(sql), {"d": dataset_id}
+    )
+    for rows in result.partitions(LIFECYCLE_CHUNK):
+        yield rows
+
+
+def write_cold_archive(engine, dataset_id: int, progress=_noop) -> str:
+    """
+    dataset 全量写成 gzip NDJSON（items / tasks / annotations）+ dataset.json，返回目录。
+    先写 .part 目录，完整写完再 rename，目录存在即代表归档完整
+    """
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    final = os.path.join(COLD_STORAGE_DIR, f"dataset_{dataset_id}", stamp)
+    tmp = final + ".part"
+    os.makedirs(tmp, exist_ok=True)
+
+    try:
+        with engine.connect() as conn:
+            meta = conn.execute(
+                text("SELECT id, name, created_by, created_at, version FROM datasets WHERE id = :d"),
+                {"d": dataset_id},
+            ).mappings().one()
+
+            # JSON 文本都由 Postgres 生成，Python 端只负责写，不做 loads/dumps
+            written = {}
+            for name, sql in (
+                ("items", "SELECT e::text FROM datasets d, jsonb_array_elements(d.items_json->'items') AS e "
+                          "WHERE d.id = :d"),
+                ("tasks", "SELECT row_to_json(t)::text FROM tasks t WHERE t.dataset_id = :d ORDER BY t.id"),
+            ):
+                n = 0
+                with gzip.open(os.path.join(tmp, f"{name}.ndjson.gz"), "wt", encoding="utf-8",
+                               compresslevel=COLD_GZIP_LEVEL) as f:
+                    for rows in _stream(conn, sql, dataset_id):
+                        f.write("\n".join(r[0] for r in rows) + "\n")
+                        n += len(rows)
+                        progress(f"archive {name}", n, None)
+                written[name] = n
+
+            n = 0
+            with gzip.open(os.path.join(tmp, "annotations.ndjson.gz"), "wt", encoding="utf-8",
+                           compresslevel=COLD_GZIP_LEVEL) as f:
+                sql = ("SELECT task_id, created_at, digest, payload FROM annotation_archive "
+                       "WHERE dataset_id = :d ORDER BY id")
+                for rows in _stream(conn, sql, dataset_id):
+                    lines = []
+                    for task_id, created_at, digest, payload in rows:
+                        head = json.dumps({"task_id": task_id, "archived_at": created_at.isoformat(), "digest": digest})
+                        # payload 解压后本身就是 JSON 文本，直接拼进去
+                        lines.append(f'{head[:-1]}, "annotations": {zlib.decompress(payload).decode("utf-8")}}}')
+                    f.write("\n".join(lines) + "\n")
+                    n += len(rows)
+                    progress("archive annotations", n, None)
+            written["annotations"] = n
+
+        with open(os.path.join(tmp, "dataset.json"), "w", encoding="utf-8") as f:
+            json.dump({**dict(meta), "created_at": meta["created_at"].isoformat(), "rows": written}, f, indent=2)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    os.replace(tmp, final)
+    return final
+
+
+# -----------------------------
+# 三种生命周期操作
+# -----------------------------
+def delete_dataset(engine, dataset_id: int, progress=_noop) -> dict:
+    counts = purge(engine, dataset_id, progress)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM datasets WHERE id = :d"), {"d": dataset_id})
+    shutil.rmtree(os.path.join(exports.EXPORT_DIR, f"dataset_{dataset_id}"), ignore_errors=True)
+    return counts
+
+
+def archive_dataset(engine, dataset_id: int, progress=_noop) -> dict:
+    """
+    冷存储写完后再删热数据；items_json 清空，dataset 行保留（status=archived）
+    """
+    path = write_cold_archive(engine, dataset_id, progress)
+    counts = purge(engine, dataset_id, progress)
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE datasets SET items_json = '{\"items\": []}'::jsonb, status = 'archived', "
+                 "version = version + 1 WHERE id = :d"),
+            {"d": dataset_id},
+        )
+    shutil.rmtree(os.path.join(exports.EXPORT_DIR, f"dataset_{dataset_id}"), ignore_errors=True)
+    return {**counts, "path": path}
+
+
+def reset_dataset(engine, dataset_id: int, progress=_noop) -> dict:
+    """
+    删掉 tasks 和标注派生数据，保留 items，之后可以重新 import_to_ls
+    （Label Studio 里已有的 task 不会被删，需要的话在 LS 侧清理项目）
+    """
+    counts = purge(engine, dataset_id, progress)
+    with engine.begin() as conn:
+        partitioning.ensure_partitions(conn, dataset_id)
+        conn.execute(
+            text("UPDATE datasets SET status = 'active', version = version + 1 WHERE id = :d"),
+            {"d": dataset_id},
+        )
+    return counts
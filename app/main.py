@@ -1,27 +1,38 @@
-from fastapi import FastAPI, Depends
-from sqlalchemy import text, create_engine
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse
 import os
+import redis
 
 from app.routers.auth import router as auth_router
 from app.routers.datasets import router as datasets_router
 from app.routers.jobs import router as jobs_router
 from app.deps import get_current_user, require_role
-from app.models import Base
+from app import cache, db, metrics, profiling
 from app.routers import tasks
 from app.routers import annotator_tasks
 
-app = FastAPI(title="AI Data Platform Mini")
+REDIS_URL = os.environ.get("REDIS_URL")
 
-app.include_router(annotator_tasks.router)
-app.include_router(tasks.router)
 
-DATABASE_URL = os.environ.get("DATABASE_URL")
-REDIS_URL = os.environ.get("REDIS_URL")
+# Phase 2: 自动建表（MVP，不用 Alembic）——放到 lifespan 的后台线程里，数据库暂时不可用也能先启动，
+# 就绪与否看 /ready
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop = db.start_schema_init()
+    yield
+    stop.set()
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
-# Phase 2: 自动建表（MVP，不用 Alembic）
-Base.metadata.create_all(engine)
+app = FastAPI(title="AI Data Platform Mini", lifespan=lifespan)
+app.middleware("http")(profiling.profiling_middleware)
+
+app.include_router(annotator_tasks.router)
+app.include_router(tasks.router)
+
+metrics.install_db_hooks()
+profiling.install_db_hooks()
 
 # 路由挂载（一定要在 app 创建之后）
 app.include_router(auth_router)
@@ -31,9 +42,20 @@ app.include_router(jobs_router)
 
 @app.get("/health")
 def health():
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-    return {"status": "ok", "db": "ok", "redis_url": REDIS_URL}
+    # liveness：进程活着就行，不查依赖（数据库抖动不该让编排系统重启 API）
+    return {"status": "ok", "redis_url": REDIS_URL}
+
+
+@app.get("/ready")
+def ready():
+    # readiness：表结构已初始化且数据库可连，否则 503（负载均衡暂不转发流量）
+    state = db.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/me")
@@ -46,6 +68,31 @@ def admin_ping(user=Depends(require_role("admin"))):
     return {"ok": True, "as": "admin", "user": user}
 
 
+@app.get("/admin/cache/stats")
+def admin_cache_stats(user=Depends(require_role("admin"))):
+    return cache.cache_stats()
+
+
+# profile 只存在 Redis 里：Redis 不可用时返回 503，而不是 500
+@app.get("/admin/profiles")
+def admin_list_profiles(limit: int = 50, user=Depends(require_role("admin"))):
+    try:
+        return {"items": profiling.list_profiles(min(int(limit), profiling.PROFILE_KEEP))}
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Profile store unavailable")
+
+
+@app.get("/admin/profiles/{profile_id}")
+def admin_get_profile(profile_id: str, user=Depends(require_role("admin"))):
+    try:
+        p = profiling.get_profile(profile_id)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="Profile store unavailable")
+    if not p:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return p
+
+
 @app.get("/annotator/ping")
 def annotator_ping(user=Depends(require_role("admin", "annotator"))):
-    return {"ok": True, "as": "annotator", "user": user}
\ No newline at end of file
+    return {"ok": True, "as": "annotator", "user": user}
@@ -0,0 +1,218 @@
+import os
+import re
+import shutil
+import time
+
+import redis
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Celery prefork 会起多个子进程：设置 PROMETHEUS_MULTIPROC_DIR 后各进程写共享目录，
+# exporter 汇总输出；不设置时就是普通单进程 registry
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", "9100"))
+QUEUE_NAMES = [q.strip() for q in os.environ.get("METRICS_QUEUES", "celery").split(",") if q.strip()]
+
+LS_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+DB_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+JOB_PHASE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+LS_REQUEST_SECONDS = Histogram(
+    "ls_request_seconds",
+    "Label Studio API latency",
+    ["method", "endpoint", "status"],
+    buckets=LS_LATENCY_BUCKETS,
+)
+LS_TOKEN_REFRESH_SECONDS = Histogram(
+    "ls_token_refresh_seconds",
+    "Label Studio access token refresh latency",
+    ["status"],
+    buckets=LS_LATENCY_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "SQL statement latency",
+    ["operation"],
+    buckets=DB_LATENCY_BUCKETS,
+)
+JOB_PHASE_SECONDS = Histogram(
+    "job_phase_seconds",
+    "Celery job phase duration",
+    ["job_type", "phase", "status"],
+    buckets=JOB_PHASE_BUCKETS,
+)
+JOB_DURATION_SECONDS = Histogram(
+    "job_duration_seconds",
+    "Celery job total duration",
+    ["job_type", "status"],
+    buckets=JOB_PHASE_BUCKETS,
+)
+JOB_ITEMS_TOTAL = Counter(
+    "job_items_total",
+    "Items processed by Celery jobs",
+    ["job_type"],
+)
+JOB_ITEMS_PER_SECOND = Gauge(
+    "job_items_per_second",
+    "Throughput of the most recent Celery job run",
+    ["job_type"],
+    multiprocess_mode="mostrecent",
+)
+
+# /api/tasks/123 -> /api/tasks/{id}，避免 label 基数爆炸
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def ls_endpoint(url: str) -> str:
+    path = url.split("://", 1)[-1]
+    path = "/" + path.split("/", 1)[1] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+class PhaseTimer:
+    """
+    job 分阶段计时：lap(phase) 把距上次打点的耗时累加到该阶段，
+    逐条处理时 fetch/reconcile/write 交错出现也能正确累加；
+    成功时 finish()、失败时 fail() 统一上报（status 标签区分），只上报一次
+    """
+
+    def __init__(self, job_type: str):
+        self.job_type = job_type
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self._phases = {}
+        self._done = False
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + (now - self._mark)
+        self._mark = now
+
+    def _observe(self, status: str) -> float:
+        self._done = True
+        for phase, seconds in self._phases.items():
+            JOB_PHASE_SECONDS.labels(self.job_type, phase, status).observe(seconds)
+        elapsed = time.perf_counter() - self.started
+        JOB_DURATION_SECONDS.labels(self.job_type, status).observe(elapsed)
+        return elapsed
+
+    def finish(self, items: int):
+        if not self._done:
+            observe_throughput(self.job_type, items, self._observe("success"))
+
+    def fail(self):
+        """
+        出错那一段还没 lap，记到 "failed" 阶段；吞吐量只统计成功的 job
+        """
+        if not self._done:
+            self.lap("failed")
+            self._observe("failed")
+
+
+def observe_throughput(job_type: str, items: int, seconds: float):
+    JOB_ITEMS_TOTAL.labels(job_type).inc(items)
+    JOB_ITEMS_PER_SECOND.labels(job_type).set(items / seconds if seconds > 0 else 0.0)
+
+
+# -----------------------------
+# SQLAlchemy：挂在 Engine 类上，对所有 engine 生效
+# -----------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    op = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_QUERY_SECONDS.labels(op).observe(elapsed)
+
+
+def install_db_hooks():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -----------------------------
+# 队列深度：scrape 时现查 Redis（Celery + Redis broker 的队列就是一个 list）
+# -----------------------------
+class QueueDepthCollector:
+    def __init__(self, broker_url: str):
+        self.broker_url = broker_url
+        self._conn = None
+
+    def collect(self):
+        g = GaugeMetricFamily("celery_queue_depth", "Messages waiting in Celery queue", labels=["queue"])
+        try:
+            if self._conn is None:
+                self._conn = redis.Redis.from_url(
+                    self.broker_url, socket_timeout=0.5, socket_connect_timeout=0.5
+                )
+            for q in QUEUE_NAMES:
+                g.add_metric([q], self._conn.llen(q))
+        except redis.RedisError:
+            pass
+        yield g
+
+
+_REGISTRY = {"reg": None}
+
+
+def _registry() -> CollectorRegistry:
+    """
+    multiprocess 模式下用独立 registry 汇总共享目录（每次 collect 现读）；否则用默认 REGISTRY
+    """
+    if _REGISTRY["reg"] is None:
+        if MULTIPROC_DIR:
+            reg = CollectorRegistry()
+            multiprocess.MultiProcessCollector(reg)
+        else:
+            reg = REGISTRY
+        broker = os.environ.get("CELERY_BROKER_URL") or ""
+        if broker.startswith("redis"):
+            reg.register(QueueDepthCollector(broker))
+        _REGISTRY["reg"] = reg
+    return _REGISTRY["reg"]
+
+
+def render_latest() -> bytes:
+    """
+    API 的 /metrics 用
+    """
+    return generate_latest(_registry())
+
+
+def start_worker_exporter():
+    """
+    worker 主进程里起一个 HTTP exporter（子进程的指标通过 multiproc 目录汇总）
+    """
+    start_http_server(WORKER_METRICS_PORT, registry=_registry())
+
+
+def reset_multiproc_dir():
+    """
+    worker 启动时（fork 子进程之前）清空上一轮残留的指标文件
+    """
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def mark_process_dead(pid: int):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -1,9 +1,15 @@
+import os
+import logging
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import String, Integer, BigInteger, Float, DateTime, ForeignKey, LargeBinary
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, REAL
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import Text
+from sqlalchemy import Text, text
+
+from app.partitioning import PARTITION_BY_DATASET, is_partitioned
+
+log = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
     pass
@@ -13,25 +19,49 @@ class Dataset(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
-    items_json: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    # 大数据集的 items 可能几十 MB，只有真正访问时才加载（db.get(Dataset) 不再顺带拉它）
+    items_json: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict, deferred=True)
     created_by: Mapped[str] = mapped_column(String(100), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # 导出内容每变化一次 +1（import / export_from_ls 写回标注时），用于导出产物缓存
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    # active / deleting / archiving / archived / resetting（生命周期 job 运行中时拒绝再次触发）
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="active", server_default="active")
+
+    # 不走 ORM 级联：删 dataset 会把所有 Task 加载进内存逐行删，改由 app/lifecycle.py 分批 SQL 删除
+    tasks: Mapped[List["Task"]] = relationship(back_populates="dataset", passive_deletes="all")
+
+# 分区表的主键必须包含分区键：开启按 dataset 分区时主键变成 (id, dataset_id)，
+# ORM 按 id + dataset_id 定位行，UPDATE / DELETE 能裁剪到单个分区
+_PARTITION_ARGS = {"postgresql_partition_by": "LIST (dataset_id)"} if PARTITION_BY_DATASET else {}
 
-    tasks: Mapped[List["Task"]] = relationship(back_populates="dataset", cascade="all,delete-orphan")
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = _PARTITION_ARGS
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    dataset_id: Mapped[int] = mapped_column(ForeignKey("datasets.id"), index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    dataset_id: Mapped[int] = mapped_column(ForeignKey("datasets.id"), index=True, primary_key=PARTITION_BY_DATASET)
     ls_project_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     ls_task_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # 对应 dataset.items_json["items"][*]["id"]
+    item_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # 导入时把 item 的 text 冗余一份到任务行上：按 task 取文本时不用展开整个 items_json
+    item_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="new")
     assigned_to: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     assigned_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     label: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    # 旧版导出把整个 annotations 数组塞在这里；现在只保留紧凑列，完整历史进 annotation_archive
     annotation_json: Mapped[Optional[dict]] = mapped_column(JSONB, nullable=True)
+    annotator: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    annotated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    lead_time: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    annotation_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    annotation_digest: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    # 预标注模型给出的各类别概率（如 [p_OK, p_NG]），auto_assign 的主动学习采样用
+    model_probs: Mapped[Optional[list]] = mapped_column(ARRAY(REAL), nullable=True)
     dataset: Mapped["Dataset"] = relationship(back_populates="tasks")
 
 class Job(Base):
@@ -45,3 +75,183 @@ class Job(Base):
     created_by: Mapped[str] = mapped_column(String(100), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
+
+class AnnotationArchive(Base):
+    """
+    追加写的标注历史：LS 返回的完整 annotations 数组（zlib 压缩的 JSON），只在按需查看时解压
+    同一个 task 的 annotations 没变化（digest 相同）时不会重复写
+    """
+    __tablename__ = "annotation_archive"
+    __table_args__ = _PARTITION_ARGS
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    task_id: Mapped[int] = mapped_column(Integer, index=True)
+    dataset_id: Mapped[int] = mapped_column(Integer, index=True, primary_key=PARTITION_BY_DATASET)
+    ls_task_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    digest: Mapped[str] = mapped_column(String(40), nullable=False)
+    annotation_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    payload: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AnnotationVote(Base):
+    """
+    一致性分析的紧凑输入：每个 (task, 标注员) 一行，从 annotation_archive 增量抽取
+    """
+    __tablename__ = "annotation_votes"
+    __table_args__ = _PARTITION_ARGS
+
+    task_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    annotator: Mapped[str] = mapped_column(String(100), primary_key=True)
+    dataset_id: Mapped[int] = mapped_column(Integer, index=True, primary_key=PARTITION_BY_DATASET)
+    label: Mapped[str] = mapped_column(String(64), nullable=False)
+
+
+class DatasetAgreement(Base):
+    """
+    dataset 级一致性指标（物化，dashboard 直接读）；archive_watermark 是已抽取到的 annotation_archive.id
+    """
+    __tablename__ = "dataset_agreement"
+
+    dataset_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    archive_watermark: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    voted_tasks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    multi_voted_tasks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    annotators: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    fleiss_kappa: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    mean_cohen_kappa: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    majority_confidence: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    unanimous_ratio: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AnnotatorAgreement(Base):
+    __tablename__ = "annotator_agreement"
+
+    dataset_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    annotator: Mapped[str] = mapped_column(String(100), primary_key=True)
+    votes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    shared_tasks: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # 和其他标注员两两 Cohen's kappa 的加权平均（权重 = 共同标注的 task 数）
+    cohen_kappa: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    # 和“其他人多数票”一致的比例（留一法，不算自己那一票）
+    majority_agreement: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# create_all 不会给已存在的表加列（MVP 不用 Alembic），新增列在这里补一条：(表, 列, 类型)
+# ADD COLUMN IF NOT EXISTS 即使列已存在也要先拿 ACCESS EXCLUSIVE 锁，所以先查 information_schema，缺列时才 ALTER
+COLUMN_PATCHES = [
+    ("datasets", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("tasks", "item_id", "INTEGER"),
+    ("datasets", "status", "VARCHAR(20) NOT NULL DEFAULT 'active'"),
+    ("tasks", "annotator", "VARCHAR(100)"),
+    ("tasks", "annotated_at", "TIMESTAMP WITHOUT TIME ZONE"),
+    ("tasks", "lead_time", "DOUBLE PRECISION"),
+    ("tasks", "annotation_count", "INTEGER"),
+    ("tasks", "annotation_digest", "VARCHAR(40)"),
+    ("tasks", "model_probs", "REAL[]"),
+    ("tasks", "item_text", "TEXT"),
+]
+
+# 补丁 DDL 拿不到锁（比如 export_from_ls 的长事务还在读 tasks）时很快放弃，交给 db.start_schema_init 的退避重试；
+# 否则排在锁队列里的 ALTER 会挡住后面所有读 tasks 的请求
+SCHEMA_LOCK_TIMEOUT = os.environ.get("SCHEMA_LOCK_TIMEOUT", "5s")
+
+
+def _add_column_ddl(table: str, column: str, ddl: str) -> str:
+    return f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = '{table}' AND column_name = '{column}'
+        ) THEN
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl};
+        END IF;
+    END
+    $$
+    """
+
+
+SCHEMA_PATCHES = [_add_column_ddl(*c) for c in COLUMN_PATCHES] + [
+    # payload 已经是 zlib 压缩过的，别让 TOAST 再压一遍；
+    # SET STORAGE 要拿 ACCESS EXCLUSIVE 锁，已经是 EXTERNAL（attstorage = 'e'）时跳过，不在每次启动都锁表
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_attribute
+            WHERE attrelid IN (
+                SELECT to_regclass('annotation_archive')
+                UNION SELECT relid FROM pg_partition_tree('annotation_archive')
+            )
+              AND attname = 'payload' AND attstorage <> 'e'
+        ) THEN
+            ALTER TABLE annotation_archive ALTER COLUMN payload SET STORAGE EXTERNAL;
+        END IF;
+    END
+    $$
+    """,
+]
+
+
+# 已有大表上补的索引：(索引名, 表, 列和条件)。用 CREATE INDEX CONCURRENTLY 建，不挡写入；
+# pg_index 里已有且有效时直接跳过，正常重启不碰表锁
+CONCURRENT_INDEXES = [
+    # 未分配任务池（auto_assign / bulk_assign）按 id 顺序取，避免扫已分配的行
+    ("ix_tasks_unassigned", "tasks", "(dataset_id, id) WHERE assigned_to IS NULL"),
+]
+
+
+def _index_valid(conn, name: str) -> bool | None:
+    """
+    None：索引不存在；False：存在但无效（上次 CONCURRENTLY 中途失败，或分区表上还没挂全的 ON ONLY 索引）
+    """
+    return conn.execute(
+        text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:n)"), {"n": name}
+    ).scalar()
+
+
+def ensure_index_concurrently(engine, name: str, table: str, spec: str) -> bool:
+    """
+    返回是否建了索引。CONCURRENTLY 不能在事务里跑，用 autocommit 连接；
+    分区表不支持 CONCURRENTLY：父表先建 ON ONLY 的空壳索引，各分区 CONCURRENTLY 建好后 ATTACH，全部挂上后父索引才变有效
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SELECT set_config('lock_timeout', :t, false)"), {"t": SCHEMA_LOCK_TIMEOUT})
+        valid = _index_valid(conn, name)
+        if valid:
+            return False
+        if not is_partitioned(conn, table):
+            if valid is False:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY {name} ON {table} {spec}"))
+            return True
+
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {spec}"))
+        parts = conn.execute(
+            text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(:t) ORDER BY 1"),
+            {"t": table},
+        ).scalars().all()
+        for part in parts:
+            part_index = f"{name}_{part}"
+            if _index_valid(conn, part_index) is False:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {part_index}"))
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {part_index} ON {part} {spec}"))
+            conn.execute(text(f"ALTER INDEX {name} ATTACH PARTITION {part_index}"))
+        return True
+
+
+def init_schema(engine):
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("SELECT set_config('lock_timeout', :t, true)"), {"t": SCHEMA_LOCK_TIMEOUT})
+        for ddl in SCHEMA_PATCHES:
+            conn.execute(text(ddl))
+    # 索引只影响性能：拿不到锁（等不到旧事务结束）就记日志跳过，下次启动再建，不挡 /ready
+    for name, table, spec in CONCURRENT_INDEXES:
+        try:
+            ensure_index_concurrently(engine, name, table, spec)
+        except Exception:
+            log.exception("create index %s concurrently failed, will retry on next startup", name)
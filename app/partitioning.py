@@ -0,0 +1,98 @@
+import os
+
+from sqlalchemy import text
+
+# tasks / annotation_archive / annotation_votes 按 dataset_id 做 LIST 分区，每个 dataset 一个分区：
+# 一个 dataset 的导入/导出抖动只让自己的分区膨胀，删除/归档 dataset 变成 DETACH + DROP。
+# 只在建表时生效（create_all 不会改已存在的表），已有数据的库需要重建表后再打开
+PARTITION_BY_DATASET = os.environ.get("PARTITION_BY_DATASET", "false").lower() in ("1", "true", "yes")
+
+PARTITIONED_TABLES = ("tasks", "annotation_archive", "annotation_votes")
+
+
+def partition_name(table: str, dataset_id: int) -> str:
+    return f"{table}_d{int(dataset_id)}"
+
+
+def is_partitioned(conn, table: str = "tasks") -> bool:
+    """
+    以库里的实际表结构为准（不看环境变量），开关改了也不会对不上
+    """
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t)"), {"t": table}
+    ).scalar())
+
+
+def _attached(conn, table: str, part: str) -> bool | None:
+    """
+    None：分区表不存在；False：存在但没挂在父表上（上次 DETACH 后没来得及 DROP）
+    """
+    row = conn.execute(
+        text("""
+            SELECT i.inhparent = to_regclass(:t)
+            FROM (SELECT to_regclass(:p) AS oid) c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            WHERE c.oid IS NOT NULL
+        """),
+        {"t": table, "p": part},
+    ).first()
+    if row is None:
+        return None
+    return bool(row[0])
+
+
+# -----------------------------
+# 创建分区
+# -----------------------------
+def ensure_partitions(conn, dataset_id: int) -> list:
+    """
+    给 dataset 建好各表的分区（幂等），返回新建的分区名；表没有分区时什么都不做。
+    先 CREATE TABLE (LIKE ...) 再 ATTACH：ATTACH 对父表只拿 SHARE UPDATE EXCLUSIVE，
+    不会像 CREATE TABLE ... PARTITION OF 那样挡住其他 dataset 的读写
+    """
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table):
+            continue
+        part = partition_name(table, dataset_id)
+        state = _attached(conn, table, part)
+        if state:
+            continue
+        if state is False:
+            conn.execute(text(f"DROP TABLE {part}"))
+        conn.execute(text(f"CREATE TABLE {part} (LIKE {table} INCLUDING DEFAULTS INCLUDING STORAGE)"))
+        conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {part} FOR VALUES IN ({int(dataset_id)})"))
+        created.append(part)
+    return created
+
+
+# -----------------------------
+# 删除分区
+# -----------------------------
+def drop_partitions(engine, dataset_id: int, progress=None) -> dict:
+    """
+    DETACH ... CONCURRENTLY 后 DROP，返回各表被删的行数；没有分区的表不处理（调用方自己分批删）。
+    CONCURRENTLY 不能在事务里跑，也要求父表没有 DEFAULT 分区（这里从不建 DEFAULT 分区）
+    """
+    counts = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            part = partition_name(table, dataset_id)
+            state = _attached(conn, table, part)
+            if state is None:
+                counts[table] = 0
+                continue
+            counts[table] = conn.execute(text(f"SELECT count(*) FROM {part}")).scalar_one()
+            if state:
+                pending = conn.execute(
+                    text("SELECT inhdetachpending FROM pg_inherits WHERE inhrelid = to_regclass(:p)"), {"p": part}
+                ).scalar()
+                # 上次 DETACH CONCURRENTLY 被打断，只能 FINALIZE
+                mode = "FINALIZE" if pending else "CONCURRENTLY"
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {part} {mode}"))
+            conn.execute(text(f"DROP TABLE {part}"))
+            if progress:
+                progress(f"drop {part}", counts[table], counts[table])
+    return counts
@@ -0,0 +1,23 @@
+import os
+
+# API 进程只投递任务：按 task 名字 send_task，不 import app.celery_app（连带 requests / numpy / 所有 task 代码）；
+# Celery 本身也等第一次投递时才加载
+BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://redis:6379/0")
+RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
+
+_PRODUCER = {"app": None}
+
+
+def producer():
+    if _PRODUCER["app"] is None:
+        from celery import Celery
+
+        _PRODUCER["app"] = Celery("aiplatform", broker=BROKER_URL, backend=RESULT_BACKEND)
+    return _PRODUCER["app"]
+
+
+def send(name: str, *args):
+    """
+    name 是 app/celery_app.py 里 @celery.task(name=...) 的名字
+    """
+    return producer().send_task(name, args=list(args))
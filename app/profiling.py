@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import cache
+
+# 按需 profiling：header 触发（需 PROFILING_ENABLED=true）或按采样率随机触发
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = "x-profile"
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+CELERY_PROFILE_SAMPLE_RATE = float(os.environ.get("CELERY_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000.0
+PROFILE_TTL_SECONDS = int(os.environ.get("PROFILE_TTL_SECONDS", "86400"))
+PROFILE_KEEP = 200
+RECENT_KEY = "profiles:recent"
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_CURRENT: ContextVar["ProfileSession | None"] = ContextVar("profile_session", default=None)
+_INFLIGHT = {"n": 0}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+class _Sampler(threading.Thread):
+    """
+    采样 profiler：每隔 interval 抓一次 sys._current_frames()，按折叠栈计数
+    - thread_id 指定时只采这个线程（Celery task 在固定线程里跑）
+    - 不指定时采所有“栈里有 app 代码”的线程（FastAPI 同步 endpoint 在线程池里跑，事先不知道是哪个线程）
+    """
+
+    def __init__(self, interval: float, thread_id: int | None = None):
+        super().__init__(daemon=True, name="profile-sampler")
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_evt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._stop_evt.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me or (self.thread_id is not None and tid != self.thread_id):
+                    continue
+                stack = _collapse(frame, require_app=self.thread_id is None)
+                if stack:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_evt.set()
+        self.join(timeout=1)
+
+
+def _collapse(frame, require_app: bool) -> str | None:
+    parts = []
+    has_app = False
+    while frame is not None and len(parts) < 64:
+        code = frame.f_code
+        fn = code.co_filename
+        if fn == _THIS_FILE:
+            return None
+        if fn.startswith(_APP_DIR):
+            has_app = True
+        mod = frame.f_globals.get("__name__", os.path.basename(fn))
+        parts.append(f"{mod}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    if require_app and not has_app:
+        return None
+    return ";".join(reversed(parts))
+
+
+class ProfileSession:
+    def __init__(self, kind: str, name: str, thread_id: int | None = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.name = name
+        self.started_at = datetime.utcnow()
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.statements = {}
+        self.slowest = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._sampler = _Sampler(PROFILE_INTERVAL_SECONDS, thread_id)
+        self._sampler.start()
+
+    def record_query(self, statement: str, seconds: float):
+        stmt = " ".join(statement.split())[:300]
+        with self._lock:
+            self.query_count += 1
+            self.query_seconds += seconds
+            agg = self.statements.setdefault(stmt, [0, 0.0])
+            agg[0] += 1
+            agg[1] += seconds
+            self.slowest.append((seconds, stmt))
+            if len(self.slowest) > 20:
+                self.slowest.sort(reverse=True)
+                del self.slowest[10:]
+
+    def finish(self, **extra) -> dict:
+        duration = time.perf_counter() - self._t0
+        self._sampler.stop()
+        # 同一条 SQL 重复执行很多次 = 典型 N+1
+        repeated = sorted(self.statements.items(), key=lambda kv: kv[1][0], reverse=True)[:10]
+        summary = {
+            "id": self.id,
+            "kind": self.kind,
+            "name": self.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(duration * 1000, 2),
+            "db": {
+                "queries": self.query_count,
+                "total_ms": round(self.query_seconds * 1000, 2),
+                "slowest": [
+                    {"ms": round(s * 1000, 2), "statement": stmt}
+                    for s, stmt in sorted(self.slowest, reverse=True)[:10]
+                ],
+                "repeated": [
+                    {"count": c, "total_ms": round(t * 1000, 2), "statement": stmt}
+                    for stmt, (c, t) in repeated
+                ],
+            },
+            "profile": {
+                "interval_ms": PROFILE_INTERVAL_SECONDS * 1000,
+                "samples": self._sampler.samples,
+                # 折叠栈格式（flamegraph.pl / speedscope 可直接读）
+                "stacks": [
+                    {"stack": s, "count": c} for s, c in self._sampler.stacks.most_common(50)
+                ],
+            },
+        }
+        summary.update(extra)
+        return summary
+
+
+# -----------------------------
+# SQL 计数：只在当前上下文有 session 时记录
+# -----------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _CURRENT.get() is not None:
+        conn.info.setdefault("_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _CURRENT.get()
+    starts = conn.info.get("_profile_start")
+    if session is None or not starts:
+        return
+    session.record_query(statement, time.perf_counter() - starts.pop())
+
+
+def install_db_hooks():
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# -----------------------------
+# 存储：Redis（带 TTL），保留最近 PROFILE_KEEP 条
+# -----------------------------
+def save_profile(summary: dict):
+    conn = cache.redis_client()
+    if conn is None:
+        return
+    try:
+        pipe = conn.pipeline()
+        pipe.set(f"profile:{summary['id']}", json.dumps(summary), ex=PROFILE_TTL_SECONDS)
+        pipe.lpush(RECENT_KEY, summary["id"])
+        pipe.ltrim(RECENT_KEY, 0, PROFILE_KEEP - 1)
+        pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+def get_profile(profile_id: str) -> dict | None:
+    conn = cache.redis_client()
+    if conn is None:
+        return None
+    raw = conn.get(f"profile:{profile_id}")
+    return json.loads(raw) if raw else None
+
+
+def list_profiles(limit: int = 50) -> list:
+    """
+    最近的 profile 概要（不含栈和 SQL 明细）
+    """
+    conn = cache.redis_client()
+    if conn is None:
+        return []
+    ids = [i.decode("utf-8") for i in conn.lrange(RECENT_KEY, 0, max(0, limit - 1))]
+    out = []
+    for raw in conn.mget([f"profile:{i}" for i in ids]) if ids else []:
+        if not raw:
+            continue
+        p = json.loads(raw)
+        out.append({
+            "id": p["id"],
+            "kind": p["kind"],
+            "name": p["name"],
+            "started_at": p["started_at"],
+            "duration_ms": p["duration_ms"],
+            "db_queries": p["db"]["queries"],
+            "db_ms": p["db"]["total_ms"],
+            "status": p.get("status"),
+        })
+    return out
+
+
+# -----------------------------
+# FastAPI middleware
+# -----------------------------
+def _should_profile_request(request) -> bool:
+    if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+async def profiling_middleware(request, call_next):
+    if not _should_profile_request(request):
+        return await call_next(request)
+
+    with _INFLIGHT_LOCK:
+        _INFLIGHT["n"] += 1
+        concurrent = _INFLIGHT["n"] - 1
+
+    session = ProfileSession("http", f"{request.method} {request.url.path}")
+    token = _CURRENT.set(session)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        _CURRENT.reset(token)
+        with _INFLIGHT_LOCK:
+            _INFLIGHT["n"] -= 1
+        route = request.scope.get("route")
+        summary = session.finish(
+            status=status,
+            route=getattr(route, "path", None),
+            # 采样的是所有带 app 栈的线程，并发请求会混进来，这里记一下方便判断
+            concurrent_requests=concurrent,
+        )
+        save_profile(summary)
+
+    response.headers["X-Profile-Id"] = session.id
+    response.headers["X-DB-Queries"] = str(summary["db"]["queries"])
+    response.headers["X-DB-Time-Ms"] = str(summary["db"]["total_ms"])
+    return response
+
+
+# -----------------------------
+# Celery：task_prerun / task_postrun 信号
+# 触发：CELERY_PROFILE_SAMPLE_RATE 采样，或 apply_async(headers={"profile": "1"})
+# -----------------------------
+_TASK_SESSIONS = {}
+
+
+def _should_profile_task(task) -> bool:
+    flag = getattr(task.request, "profile", None)
+    if flag is None and isinstance(getattr(task.request, "headers", None), dict):
+        flag = task.request.headers.get("profile")
+    if str(flag).lower() in ("1", "true", "yes"):
+        return True
+    return CELERY_PROFILE_SAMPLE_RATE > 0 and random.random() < CELERY_PROFILE_SAMPLE_RATE
+
+
+def task_prerun(task_id=None, task=None, args=None, **kwargs):
+    if task is None or not _should_profile_task(task):
+        return
+    session = ProfileSession("task", task.name, thread_id=threading.get_ident())
+    _TASK_SESSIONS[task_id] = (session, _CURRENT.set(session), args)
+
+
+def task_postrun(task_id=None, state=None, **kwargs):
+    entry = _TASK_SESSIONS.pop(task_id, None)
+    if entry is None:
+        return
+    session, token, args = entry
+    _CURRENT.reset(token)
+    save_profile(session.finish(status=state, task_id=task_id, args=list(args or [])[:5]))
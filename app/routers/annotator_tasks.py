@@ -1,25 +1,18 @@
 from __future__ import annotations
 
-import os
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import create_engine, select, func
+from sqlalchemy import select, func
 from sqlalchemy.orm import Session
 
 from app.models import Task
+from app.db import get_db
 from app.deps import get_current_user
+from app import cache
 
 router = APIRouter(prefix="/annotator", tags=["annotator"])
 
-engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
-
-
-def get_db():
-    with Session(engine) as db:
-        yield db
-
-
 def _get_username(user) -> str:
     """
     兼容两种 get_current_user 返回：
@@ -88,7 +81,14 @@ def my_stats(
     可选 dataset_id 过滤
     """
     me = _get_username(user)
+    return cache.cached(
+        "annotator_stats",
+        cache.annotator_stats_key(me, dataset_id),
+        lambda: _load_my_stats(db, me, dataset_id),
+    )
+
 
+def _load_my_stats(db: Session, me: str, dataset_id: Optional[int]) -> dict:
     # 1) assigned_total
     total_stmt = select(func.count()).select_from(Task).where(Task.assigned_to == me)
     if dataset_id is not None:
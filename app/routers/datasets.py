@@ -1,27 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import create_engine, select, func, update
+from fastapi.responses import FileResponse
+from sqlalchemy import select, func, update, text
 from sqlalchemy.orm import Session
 from datetime import datetime
+import json
+import math
 import os
 
-from app.models import Dataset, Task, Job
-from app.schemas import DatasetCreateIn, DatasetOut, DatasetStatsOut
-from app.deps import get_current_user, require_role
-
-from app.celery_app import import_dataset_to_ls, export_dataset_from_ls  # 两个 celery task
+from app.models import Dataset, Task, Job, DatasetAgreement, AnnotatorAgreement
+from app.schemas import DatasetCreateIn, DatasetOut, DatasetStatsOut, BulkAssignIn, PredictionsIn
+from app.db import get_db
+from app.deps import get_current_user, require_role, require_active
+from app import cache, exports, lifecycle, partitioning, producer
 
 
 router = APIRouter(prefix="/datasets", tags=["datasets"])
 
-DATABASE_URL = os.environ["DATABASE_URL"]
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-
-
-# ✅ 关键：get_db 必须放在所有 Depends(get_db) 之前
-def get_db():
-    with Session(engine) as session:
-        yield session
-
 
 def make_demo_items(n: int = 100):
     return [{"id": i, "text": f"demo text {i}"} for i in range(1, n + 1)]
@@ -36,15 +30,169 @@ def export_from_ls(
     user=Depends(require_role("admin")),
     db: Session = Depends(get_db),
 ):
+    require_active(db, dataset_id)
     job = Job(type="export_from_ls", status="queued", dataset_id=dataset_id, created_by=user["username"])
     db.add(job)
     db.commit()
     db.refresh(job)
 
-    export_dataset_from_ls.delay(job.id)
+    producer.send("export_dataset_from_ls", job.id)
+    return {"job_id": job.id, "status": job.status}
+
+
+# 存量 annotation_json 迁移到紧凑列 + annotation_archive
+@router.post("/{dataset_id}/compact_annotations")
+def compact_annotations_job(
+    dataset_id: int,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    require_active(db, dataset_id)
+    job = Job(type="compact_annotations", status="queued", dataset_id=dataset_id, created_by=user["username"])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    producer.send("compact_annotations", job.id)
+    return {"job_id": job.id, "status": job.status}
+
+
+# -----------------------------
+# 标注一致性（export_from_ls 有新标注时会自动触发；这里可手动重算）
+# -----------------------------
+@router.post("/{dataset_id}/agreement")
+def refresh_agreement(
+    dataset_id: int,
+    force: bool = False,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    require_active(db, dataset_id)
+    job = Job(type="agreement", status="queued", dataset_id=dataset_id, created_by=user["username"])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    producer.send("compute_agreement", job.id, force)
     return {"job_id": job.id, "status": job.status}
 
 
+@router.get("/{dataset_id}/agreement")
+def get_agreement(dataset_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    return cache.cached(
+        "dataset_agreement",
+        cache.dataset_agreement_key(dataset_id),
+        lambda: _load_agreement(db, dataset_id),
+    )
+
+
+def _load_agreement(db: Session, dataset_id: int) -> dict:
+    ds = db.get(DatasetAgreement, dataset_id)
+    if not ds:
+        raise HTTPException(status_code=404, detail="Agreement not computed yet, POST /datasets/{id}/agreement first")
+    rows = db.execute(
+        select(AnnotatorAgreement)
+        .where(AnnotatorAgreement.dataset_id == dataset_id)
+        .order_by(AnnotatorAgreement.votes.desc())
+    ).scalars().all()
+    return {
+        "dataset_id": dataset_id,
+        "voted_tasks": ds.voted_tasks,
+        "multi_voted_tasks": ds.multi_voted_tasks,
+        "annotators": ds.annotators,
+        "fleiss_kappa": ds.fleiss_kappa,
+        "mean_cohen_kappa": ds.mean_cohen_kappa,
+        "majority_confidence": ds.majority_confidence,
+        "unanimous_ratio": ds.unanimous_ratio,
+        "computed_at": ds.computed_at.isoformat(),
+        "per_annotator": [
+            {
+                "annotator": r.annotator,
+                "votes": r.votes,
+                "shared_tasks": r.shared_tasks,
+                "cohen_kappa": r.cohen_kappa,
+                "majority_agreement": r.majority_agreement,
+            }
+            for r in rows
+        ],
+    }
+
+
+# -----------------------------
+# 标注数据导出（Parquet / NDJSON），产物按 dataset version 缓存
+# -----------------------------
+def _check_export_format(fmt: str) -> str:
+    if fmt not in exports.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(exports.FORMATS)}")
+    return fmt
+
+
+@router.post("/{dataset_id}/export")
+def export_labeled(
+    dataset_id: int,
+    format: str = "parquet",
+    only_labeled: bool = True,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    fmt = _check_export_format(format)
+    ds = db.get(Dataset, dataset_id)
+    if not ds:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    # 当前 version 已经导出过：直接给下载地址，不再扫表
+    path = exports.artifact_path(ds.id, ds.version, fmt, only_labeled)
+    download_url = f"/datasets/{dataset_id}/export/download?format={fmt}&only_labeled={str(only_labeled).lower()}"
+    if os.path.exists(path):
+        return {"status": "ready", "version": ds.version, "download_url": download_url}
+
+    # 同一版本 / 格式已经有排队或执行中的导出：直接返回那个 job，不重复扫表
+    # （job.message 在排队期间记录产物文件名，job 结束时才被结果覆盖）
+    artifact = os.path.basename(path)
+    pending = db.execute(
+        select(Job)
+        .where(
+            Job.type == "export_labeled",
+            Job.dataset_id == dataset_id,
+            Job.status.in_(("queued", "running")),
+            Job.message == artifact,
+        )
+        .order_by(Job.id.desc())
+        .limit(1)
+    ).scalars().first()
+    if pending:
+        return {"job_id": pending.id, "status": pending.status, "version": ds.version, "download_url": download_url}
+
+    job = Job(type="export_labeled", status="queued", dataset_id=dataset_id, message=artifact,
+              created_by=user["username"])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+
+    producer.send("export_labeled_dataset", job.id, fmt, only_labeled)
+    return {"job_id": job.id, "status": job.status, "version": ds.version, "download_url": download_url}
+
+
+@router.get("/{dataset_id}/export/download")
+def download_export(
+    dataset_id: int,
+    format: str = "parquet",
+    only_labeled: bool = True,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    fmt = _check_export_format(format)
+    ds = db.get(Dataset, dataset_id)
+    if not ds:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+
+    path = exports.artifact_path(ds.id, ds.version, fmt, only_labeled)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Export not ready, POST /datasets/{id}/export first")
+    media_type = "application/vnd.apache.parquet" if fmt == "parquet" else "application/x-ndjson"
+    return FileResponse(path, media_type=media_type, filename=f"dataset_{ds.id}_{os.path.basename(path)}")
+
+
 @router.post("", response_model=DatasetOut)
 def create_dataset(
     body: DatasetCreateIn,
@@ -57,6 +205,9 @@ def create_dataset(
         created_by=user["username"],
     )
     db.add(ds)
+    db.flush()
+    # 按 dataset 分区时顺便建好分区（未分区时是空操作）
+    partitioning.ensure_partitions(db.connection(), ds.id)
     db.commit()
     db.refresh(ds)
     return {"id": ds.id, "name": ds.name, "created_by": ds.created_by}
@@ -64,14 +215,25 @@ def create_dataset(
 
 @router.get("/{dataset_id}", response_model=DatasetOut)
 def get_dataset(dataset_id: int, user=Depends(get_current_user), db: Session = Depends(get_db)):
-    ds = db.get(Dataset, dataset_id)
-    if not ds:
-        raise HTTPException(status_code=404, detail="Dataset not found")
-    return {"id": ds.id, "name": ds.name, "created_by": ds.created_by}
+    def _load():
+        ds = db.get(Dataset, dataset_id)
+        if not ds:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        return {"id": ds.id, "name": ds.name, "created_by": ds.created_by, "status": ds.status}
+
+    return cache.cached("dataset", cache.dataset_key(dataset_id), _load)
 
 
 @router.get("/{dataset_id}/stats", response_model=DatasetStatsOut)
 def dataset_stats(dataset_id: int, user=Depends(get_current_user), db: Session = Depends(get_db)):
+    return cache.cached(
+        "dataset_stats",
+        cache.dataset_stats_key(dataset_id),
+        lambda: _load_dataset_stats(db, dataset_id),
+    )
+
+
+def _load_dataset_stats(db: Session, dataset_id: int) -> dict:
     total = db.scalar(select(func.count()).select_from(Task).where(Task.dataset_id == dataset_id)) or 0
     imported_ = db.scalar(
         select(func.count()).select_from(Task).where(
@@ -90,12 +252,13 @@ def dataset_stats(dataset_id: int, user=Depends(get_current_user), db: Session =
 
 @router.post("/{dataset_id}/import_to_ls")
 def import_to_ls(dataset_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    require_active(db, dataset_id)
     job = Job(type="import_to_ls", status="queued", dataset_id=dataset_id, created_by=user["username"])
     db.add(job)
     db.commit()
     db.refresh(job)
 
-    import_dataset_to_ls.delay(job.id)
+    producer.send("import_dataset_to_ls", job.id)
     return {"job_id": job.id, "status": job.status}
 
 
@@ -107,41 +270,272 @@ def auto_assign(
     dataset_id: int,
     username: str,
     count: int = 20,
+    strategy: str = "id",
     user=Depends(require_role("admin")),
     db: Session = Depends(get_db),
 ):
+    # numpy 只在第一次调用 auto_assign 时加载，不拖慢 API 启动
+    from app import sampling
+
     try:
         count = int(count)
     except Exception:
         raise HTTPException(status_code=400, detail="count must be int")
     count = max(1, min(count, 500))
+    if strategy not in sampling.STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"strategy must be one of {list(sampling.STRATEGIES)}")
 
-    ds = db.get(Dataset, dataset_id)
-    if not ds:
-        raise HTTPException(status_code=404, detail="Dataset not found")
+    require_active(db, dataset_id)
 
-    ids = db.execute(
-        select(Task.id)
-        .where(Task.dataset_id == dataset_id, Task.assigned_to.is_(None))
-        .order_by(Task.id.asc())
-        .limit(count)
-    ).scalars().all()
+    if strategy == "id":
+        ids = db.execute(
+            select(Task.id)
+            .where(Task.dataset_id == dataset_id, Task.assigned_to.is_(None))
+            .order_by(Task.id.asc())
+            .limit(count)
+        ).scalars().all()
+    else:
+        # 不确定 + 多样：候选分数读进 NumPy 选 top-K（见 app/sampling.py）
+        ids = sampling.select_task_ids(db.connection(), dataset_id, count, strategy)
 
     if not ids:
         return {"ok": True, "dataset_id": dataset_id, "assigned_to": username, "assigned": 0, "task_ids": []}
 
     now = datetime.utcnow()
-    db.execute(
+    # 选完到 UPDATE 之间可能被别人分走，只认仍未分配的
+    ids = db.execute(
         update(Task)
-        .where(Task.id.in_(ids))
+        .where(Task.dataset_id == dataset_id, Task.id.in_(ids), Task.assigned_to.is_(None))
         .values(assigned_to=username, assigned_at=now)
-    )
+        .returning(Task.id)
+    ).scalars().all()
+    if ids:
+        # 分配结果会进导出文件，version 加一让旧的导出缓存作废
+        db.execute(update(Dataset).where(Dataset.id == dataset_id).values(version=Dataset.version + 1))
     db.commit()
+    cache.invalidate_annotator_stats(username)
 
     return {
         "ok": True,
         "dataset_id": dataset_id,
         "assigned_to": username,
+        "strategy": strategy,
         "assigned": len(ids),
         "task_ids": ids[:50],
-    }
\ No newline at end of file
+    }
+
+# -----------------------------
+# 预标注模型的概率：写 tasks.model_probs，供 auto_assign 的采样策略使用
+# -----------------------------
+PREDICTIONS_SQL = """
+UPDATE tasks t
+SET model_probs = p.probs
+FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS p(item_id int, probs real[])
+WHERE t.dataset_id = :dataset_id AND t.item_id = p.item_id
+"""
+
+
+@router.post("/{dataset_id}/predictions")
+def upload_predictions(
+    dataset_id: int,
+    body: PredictionsIn,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    preds = body.predictions
+    if not preds:
+        raise HTTPException(status_code=400, detail="predictions must not be empty")
+    if len({p.item_id for p in preds}) != len(preds):
+        raise HTTPException(status_code=400, detail="duplicate item_id in predictions")
+    # load_candidates 按第一行的类别数拼列，长度不一致会读错
+    if len({len(p.probs) for p in preds}) != 1 or not preds[0].probs:
+        raise HTTPException(status_code=400, detail="probs must be non-empty and the same length for every item")
+    if any(not math.isfinite(x) or x < 0 or x > 1 for p in preds for x in p.probs):
+        raise HTTPException(status_code=400, detail="probs must be within [0, 1]")
+
+    require_active(db, dataset_id)
+    k = len(preds[0].probs)
+    other = db.execute(
+        text("SELECT cardinality(model_probs) FROM tasks "
+             "WHERE dataset_id = :d AND model_probs IS NOT NULL AND cardinality(model_probs) <> :k "
+             "AND NOT (item_id = ANY(:ids)) LIMIT 1"),
+        {"d": dataset_id, "k": k, "ids": [p.item_id for p in preds]},
+    ).scalar()
+    if other is not None:
+        raise HTTPException(status_code=409, detail=f"dataset already has predictions with {other} classes")
+
+    rows = json.dumps([{"item_id": p.item_id, "probs": p.probs} for p in preds])
+    updated = db.execute(text(PREDICTIONS_SQL), {"dataset_id": dataset_id, "rows": rows}).rowcount
+    db.commit()
+    return {"ok": True, "dataset_id": dataset_id, "received": len(preds), "updated": updated}
+
+
+# -----------------------------
+# 批量按权重分配：一条 SQL 把未分配任务池按配额分给多个标注员
+# -----------------------------
+BULK_ASSIGN_SQL = """
+WITH quota AS (
+    SELECT u.username, u.quota
+    FROM unnest(CAST(:usernames AS text[]), CAST(:quotas AS int[])) AS u(username, quota)
+    WHERE u.quota > 0
+),
+slots AS (
+    -- 每人 quota 个槽位，按 (g - 0.5) / quota 交错排序：按 id 顺序看，各人的任务均匀穿插
+    SELECT q.username, row_number() OVER (ORDER BY (g - 0.5) / q.quota, q.username) AS rn
+    FROM quota q, generate_series(1, q.quota) AS g
+),
+locked AS (
+    SELECT id FROM tasks
+    WHERE dataset_id = :dataset_id AND assigned_to IS NULL {where}
+    ORDER BY id
+    LIMIT :total
+    FOR UPDATE SKIP LOCKED
+),
+pool AS (
+    SELECT id, row_number() OVER (ORDER BY id) AS rn FROM locked
+),
+assigned AS (
+    UPDATE tasks t
+    SET assigned_to = s.username, assigned_at = :now
+    FROM pool p JOIN slots s ON s.rn = p.rn
+    WHERE t.dataset_id = :dataset_id AND t.id = p.id AND t.assigned_to IS NULL
+    RETURNING t.assigned_to
+)
+SELECT assigned_to, count(*) FROM assigned GROUP BY assigned_to
+"""
+
+
+def _weighted_quotas(annotators: list, total: int) -> list:
+    """
+    按 weight 比例拆 total（最大余数法），超过 cap 的截断后把剩余额度再分给没封顶的人
+    """
+    quotas = [0] * len(annotators)
+    open_ = [i for i, a in enumerate(annotators) if a.cap is None or a.cap > 0]
+    remaining = total
+    while remaining > 0 and open_:
+        weight_sum = sum(annotators[i].weight for i in open_)
+        shares = {i: remaining * annotators[i].weight / weight_sum for i in open_}
+        alloc = {i: int(shares[i]) for i in open_}
+        leftover = remaining - sum(alloc.values())
+        for i in sorted(open_, key=lambda i: shares[i] - alloc[i], reverse=True)[:leftover]:
+            alloc[i] += 1
+
+        capped = []
+        for i in open_:
+            cap = annotators[i].cap
+            room = cap - quotas[i] if cap is not None else alloc[i]
+            give = min(alloc[i], room)
+            quotas[i] += give
+            remaining -= give
+            if cap is not None and quotas[i] >= cap:
+                capped.append(i)
+        if not capped:
+            break
+        open_ = [i for i in open_ if i not in capped]
+    return quotas
+
+
+@router.post("/{dataset_id}/bulk_assign")
+def bulk_assign(
+    dataset_id: int,
+    body: BulkAssignIn,
+    user=Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    annotators = body.annotators
+    if not annotators:
+        raise HTTPException(status_code=400, detail="annotators must not be empty")
+    names = [a.username for a in annotators]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="duplicate username in annotators")
+    # NaN / inf 会让 _weighted_quotas 的比例计算出错，一并拒绝
+    if any(not math.isfinite(a.weight) or a.weight <= 0 for a in annotators) or any(a.cap is not None and a.cap < 0 for a in annotators):
+        raise HTTPException(status_code=400, detail="weight must be > 0 and cap >= 0")
+    if body.limit is not None and body.limit < 0:
+        raise HTTPException(status_code=400, detail="limit must be >= 0")
+
+    require_active(db, dataset_id)
+
+    where = "AND status = :status" if body.status else ""
+    params = {"dataset_id": dataset_id}
+    if body.status:
+        params["status"] = body.status
+
+    pool = db.execute(
+        text(f"SELECT count(*) FROM tasks WHERE dataset_id = :dataset_id AND assigned_to IS NULL {where}"),
+        params,
+    ).scalar_one()
+    total = pool if body.limit is None else min(pool, body.limit)
+    quotas = _weighted_quotas(annotators, total)
+    total = sum(quotas)
+
+    counts = {}
+    if total:
+        rows = db.execute(
+            text(BULK_ASSIGN_SQL.format(where=where)),
+            {**params, "usernames": names, "quotas": quotas, "total": total, "now": datetime.utcnow()},
+        ).all()
+        if rows:
+            # 同 auto_assign：分配变了，导出缓存按 version 作废
+            db.execute(update(Dataset).where(Dataset.id == dataset_id).values(version=Dataset.version + 1))
+        db.commit()
+        counts = dict(rows)
+        cache.invalidate_annotator_stats()
+
+    return {
+        "ok": True,
+        "dataset_id": dataset_id,
+        "pool": pool,
+        "assigned": sum(counts.values()),
+        "per_annotator": [
+            {"username": n, "quota": q, "assigned": counts.get(n, 0)} for n, q in zip(names, quotas)
+        ],
+    }
+
+
+# -----------------------------
+# dataset 生命周期：删除 / 归档到冷存储 / 重置后重新导入（后台分批执行，进度看 job.message）
+# -----------------------------
+def _start_lifecycle(db: Session, dataset_id: int, op: str, allowed: tuple, user) -> dict:
+    # 条件 UPDATE 抢占状态：同一个 dataset 不会同时跑两个生命周期 job；上次同一操作失败的可以重试
+    busy_status, failed_status = lifecycle.OP_STATUS[op]
+    claimed = db.execute(
+        update(Dataset)
+        .where(Dataset.id == dataset_id, Dataset.status.in_((*allowed, failed_status)))
+        .values(status=busy_status)
+        .returning(Dataset.id)
+    ).scalar()
+    if claimed is None:
+        db.rollback()
+        ds = db.get(Dataset, dataset_id)
+        if not ds:
+            raise HTTPException(status_code=404, detail="Dataset not found")
+        raise HTTPException(status_code=409, detail=f"Dataset is {ds.status}")
+
+    job = Job(type=op, status="queued", dataset_id=dataset_id, created_by=user["username"])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    cache.invalidate_dataset(dataset_id)
+    return {"job_id": job.id, "status": job.status}
+
+
+@router.delete("/{dataset_id}")
+def delete_dataset_job(dataset_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    out = _start_lifecycle(db, dataset_id, "delete_dataset", ("active", "archived"), user)
+    producer.send("delete_dataset", out["job_id"])
+    return out
+
+
+@router.post("/{dataset_id}/archive")
+def archive_dataset_job(dataset_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    out = _start_lifecycle(db, dataset_id, "archive_dataset", ("active",), user)
+    producer.send("archive_dataset", out["job_id"])
+    return out
+
+
+@router.post("/{dataset_id}/reset")
+def reset_dataset_job(dataset_id: int, user=Depends(require_role("admin")), db: Session = Depends(get_db)):
+    out = _start_lifecycle(db, dataset_id, "reset_dataset", ("active",), user)
+    producer.send("reset_dataset", out["job_id"])
+    return out
@@ -1,34 +1,90 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import create_engine
+from sqlalchemy import select, update
 from datetime import datetime
-import os
 
-from app.models import Task
-from app.deps import get_current_user, require_role
+from app.models import Dataset, Task, AnnotationArchive
+from app.db import get_db
+from app.deps import get_current_user, require_role, require_active
+from app import annotations, cache
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
-engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
-
-def get_db():
-    with Session(engine) as db:
-        yield db
+def _get_task(db: Session, task_id: int, dataset_id: int | None) -> Task | None:
+    # 开启按 dataset 分区后主键是 (id, dataset_id)，不能 db.get；传了 dataset_id 只扫一个分区
+    q = select(Task).where(Task.id == task_id)
+    if dataset_id is not None:
+        q = q.where(Task.dataset_id == dataset_id)
+    return db.execute(q).scalars().first()
 
 @router.post("/{task_id}/assign/{username}")
 def assign_task(
     task_id: int,
     username: str,
+    dataset_id: int | None = None,
     user=Depends(get_current_user),
     _=Depends(require_role("admin")),
     db: Session = Depends(get_db),
 ):
-    task = db.get(Task, task_id)
+    task = _get_task(db, task_id, dataset_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
+    require_active(db, task.dataset_id)
 
+    prev_assignee = task.assigned_to
     task.assigned_to = username
     task.assigned_at = datetime.utcnow()
+    # 导出文件里有 assigned_to / assigned_at：同一个事务里把 version 加一，旧的导出缓存作废
+    db.execute(update(Dataset).where(Dataset.id == task.dataset_id).values(version=Dataset.version + 1))
     db.commit()
 
+    cache.invalidate_annotator_stats(username)
+    if prev_assignee and prev_assignee != username:
+        cache.invalidate_annotator_stats(prev_assignee)
+
     return {"ok": True, "task_id": task_id, "assigned_to": username}
+
+
+@router.get("/{task_id}/annotations")
+def task_annotations(
+    task_id: int,
+    history: bool = False,
+    dataset_id: int | None = None,
+    user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    完整 annotations 按需从 annotation_archive 解压；history=true 返回每个归档版本
+    """
+    task = _get_task(db, task_id, dataset_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if user["role"] != "admin" and task.assigned_to != user["username"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    q = (
+        select(AnnotationArchive)
+        .where(AnnotationArchive.dataset_id == task.dataset_id, AnnotationArchive.task_id == task_id)
+        .order_by(AnnotationArchive.id.desc())
+    )
+    if not history:
+        q = q.limit(1)
+    rows = db.execute(q).scalars().all()
+
+    versions = [
+        {"archived_at": r.created_at, "digest": r.digest, "annotations": annotations.unpack(r.payload)}
+        for r in rows
+    ]
+    # 还没迁移的旧数据直接回 annotation_json
+    if not versions and task.annotation_json:
+        versions = [{"archived_at": None, "digest": None, "annotations": task.annotation_json.get("annotations") or []}]
+
+    return {
+        "task_id": task.id,
+        "label": task.label,
+        "annotator": task.annotator,
+        "annotated_at": task.annotated_at,
+        "lead_time": task.lead_time,
+        "annotations": versions[0]["annotations"] if versions else [],
+        "history": versions if history else None,
+    }
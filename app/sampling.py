@@ -0,0 +1,209 @@
+import os
+import zlib
+
+import numpy as np
+from sqlalchemy import text
+
+# auto_assign 的主动学习采样：候选的模型概率一次性读成 NumPy 数组，打分/选 top-K 全部向量化
+# "id" 保持原来的按 id 顺序分配，不走这里
+STRATEGIES = ("id", "uncertainty", "margin", "entropy", "diverse")
+
+# diverse：先按 entropy 取 POOL_FACTOR * k 的候选池，再在池里做贪心多样性选择
+SAMPLER_POOL_FACTOR = int(os.environ.get("SAMPLER_POOL_FACTOR", "5"))
+SAMPLER_HASH_DIM = int(os.environ.get("SAMPLER_HASH_DIM", "256"))
+SAMPLER_NGRAM = int(os.environ.get("SAMPLER_NGRAM", "3"))
+# 0~1：越大越看重不确定度，越小越看重多样性
+SAMPLER_DIVERSITY_WEIGHT = float(os.environ.get("SAMPLER_DIVERSITY_WEIGHT", "0.5"))
+
+# 没有 model_probs 的任务排在所有已打分任务之后
+UNSCORED = -1.0
+
+
+# -----------------------------
+# 读候选
+# -----------------------------
+def load_candidates(conn, dataset_id: int) -> tuple:
+    """
+    返回 (task_ids int64[N], item_ids int64[N], probs float32[N, K])；未打分的行 probs 全为 NaN
+
+    每列在 Postgres 里用 *send() 拼成一段定长二进制，客户端 np.frombuffer 直接还原，
+    不会为 1M 行构造 Python 对象（逐行 fetch 要慢两个数量级）。同一个聚合查询里各列行序一致
+    """
+    # 同一个 dataset 由同一个模型打分，类别数一致，取一行即可
+    k = conn.execute(
+        text("SELECT cardinality(model_probs) FROM tasks "
+             "WHERE dataset_id = :d AND model_probs IS NOT NULL LIMIT 1"),
+        {"d": dataset_id},
+    ).scalar() or 0
+    prob_cols = "".join(
+        f", string_agg(float4send(COALESCE(model_probs[{i}], 'NaN')), '')" for i in range(1, k + 1)
+    )
+    row = conn.execute(
+        text("SELECT count(*), string_agg(int8send(id::int8), ''), "
+             f"string_agg(int8send(COALESCE(item_id, 0)::int8), ''){prob_cols} "
+             "FROM tasks WHERE dataset_id = :d AND assigned_to IS NULL"),
+        {"d": dataset_id},
+    ).one()
+    n = row[0]
+    if not n:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty((0, k), np.float32)
+    task_ids = np.frombuffer(row[1], dtype=">i8").astype(np.int64)
+    item_ids = np.frombuffer(row[2], dtype=">i8").astype(np.int64)
+    probs = np.empty((n, k), dtype=np.float32)
+    for i in range(k):
+        probs[:, i] = np.frombuffer(row[3 + i], dtype=">f4")
+    return task_ids, item_ids, probs
+
+
+def load_texts(conn, dataset_id: int, task_ids: np.ndarray, item_ids: np.ndarray) -> list:
+    """
+    只读候选池那几行的 tasks.item_text（按 (dataset_id, id) 走索引 / 单个分区），不展开整个 items_json；
+    item_text 为空的旧任务（加这一列之前导入的）才回退到 items_json 按 item_id 取
+    """
+    rows = conn.execute(
+        text("SELECT id, item_text FROM tasks WHERE dataset_id = :d AND id = ANY(:ids)"),
+        {"d": dataset_id, "ids": [int(x) for x in task_ids]},
+    ).all()
+    by_task = {tid: t for tid, t in rows if t is not None}
+
+    missing = [int(i) for tid, i in zip(task_ids, item_ids) if int(tid) not in by_task]
+    by_item = {}
+    if missing:
+        by_item = dict(conn.execute(
+            text("""
+                SELECT (e->>'id')::int, e->>'text'
+                FROM datasets d, jsonb_array_elements(d.items_json->'items') AS e
+                WHERE d.id = :d AND (e->>'id')::int = ANY(:ids)
+            """),
+            {"d": dataset_id, "ids": missing},
+        ).all())
+    return [by_task.get(int(tid)) or by_item.get(int(i)) or "" for tid, i in zip(task_ids, item_ids)]
+
+
+# -----------------------------
+# 打分（越大越值得标）
+# -----------------------------
+def scores(probs: np.ndarray, strategy: str) -> np.ndarray:
+    if probs.shape[1] == 0:
+        return np.full(probs.shape[0], UNSCORED, dtype=np.float32)
+    missing = np.isnan(probs).all(axis=1)
+    p = np.nan_to_num(probs, nan=0.0)
+
+    if strategy == "uncertainty":
+        # least confidence
+        s = 1.0 - p.max(axis=1)
+    elif strategy == "margin":
+        if p.shape[1] < 2:
+            s = 1.0 - p[:, 0]
+        else:
+            top2 = np.partition(p, -2, axis=1)[:, -2:]
+            s = 1.0 - (top2[:, 1] - top2[:, 0])
+    elif strategy in ("entropy", "diverse"):
+        s = -(p * np.log(np.clip(p, 1e-12, 1.0))).sum(axis=1)
+    else:
+        raise ValueError(f"unknown strategy: {strategy}")
+
+    s = s.astype(np.float32, copy=False)
+    s[missing] = UNSCORED
+    return s
+
+
+def top_k(s: np.ndarray, k: int, ids: np.ndarray | None = None) -> np.ndarray:
+    """
+    argpartition 取 top-k（O(N)），再只对这 k 个排序；同分按 ids 从小到大（默认按下标）
+
+    argpartition 在第 k 名的并列值里任取，未打分的任务全是 UNSCORED，不处理的话
+    补位的那几条每次都不一样。所以分界值只取严格更大的，分界上的并列再按 id 取最小的几条
+    """
+    n = s.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, np.int64)
+    if ids is None:
+        ids = np.arange(n)
+    idx = np.argpartition(-s, k - 1)[:k]
+    kth = s[idx].min()
+    above = np.flatnonzero(s > kth)
+    tied = np.flatnonzero(s == kth)
+    need = k - above.shape[0]
+    if need < tied.shape[0]:
+        tied = tied[np.argpartition(ids[tied], need - 1)[:need]]
+    idx = np.concatenate([above, tied])
+    return idx[np.lexsort((ids[idx], -s[idx]))]
+
+
+# -----------------------------
+# 多样性
+# -----------------------------
+def hashed_ngrams(texts: list, dim: int = SAMPLER_HASH_DIM, n: int = SAMPLER_NGRAM) -> np.ndarray:
+    """
+    字符 n-gram 做 crc32 hashing trick，L2 归一化后点积即余弦相似度
+    """
+    feats = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, t in enumerate(texts):
+        t = (t or "").lower()
+        if len(t) < n:
+            if t:
+                feats[row, zlib.crc32(t.encode("utf-8")) % dim] = 1.0
+            continue
+        buckets = [zlib.crc32(t[i:i + n].encode("utf-8")) % dim for i in range(len(t) - n + 1)]
+        np.add.at(feats[row], buckets, 1.0)
+    norms = np.linalg.norm(feats, axis=1, keepdims=True)
+    np.divide(feats, norms, out=feats, where=norms > 0)
+    return feats
+
+
+def greedy_diverse(feats: np.ndarray, s: np.ndarray, k: int, weight: float = SAMPLER_DIVERSITY_WEIGHT) -> np.ndarray:
+    """
+    每轮选 weight * 归一化分数 - (1 - weight) * 与已选样本的最大相似度 最大的一个；
+    每轮只做一次 (M, dim) @ (dim,) 来更新 max_sim
+    """
+    m = feats.shape[0]
+    k = min(k, m)
+    if k <= 0:
+        return np.empty(0, np.int64)
+    lo, hi = float(s.min()), float(s.max())
+    norm = (s - lo) / (hi - lo) if hi > lo else np.ones_like(s)
+
+    max_sim = np.zeros(m, dtype=np.float32)
+    taken = np.zeros(m, dtype=bool)
+    picked = np.empty(k, dtype=np.int64)
+    for j in range(k):
+        gain = weight * norm - (1.0 - weight) * max_sim
+        gain[taken] = -np.inf
+        best = int(np.argmax(gain))
+        picked[j] = best
+        taken[best] = True
+        np.maximum(max_sim, feats @ feats[best], out=max_sim)
+    return picked
+
+
+# -----------------------------
+# 对外入口
+# -----------------------------
+def select_arrays(probs: np.ndarray, k: int, strategy: str, texts_for=None, ids: np.ndarray | None = None) -> np.ndarray:
+    """
+    纯数组版本（bench 直接调）：返回候选下标。texts_for(idx) 只在 diverse 时调用，只取候选池的文本；
+    ids 用于同分时的排序（传 task_ids 则同分按 id 从小到大，不传按下标）
+    """
+    s = scores(probs, strategy)
+    if strategy != "diverse":
+        return top_k(s, k, ids)
+
+    # 池内按 (分数, id) 排好序，greedy_diverse 的 argmax 同分取第一个，结果也是确定的
+    pool = top_k(s, k * max(1, SAMPLER_POOL_FACTOR), ids)
+    texts = texts_for(pool) if texts_for else [""] * len(pool)
+    order = greedy_diverse(hashed_ngrams(texts), s[pool], k)
+    return pool[order]
+
+
+def select_task_ids(conn, dataset_id: int, k: int, strategy: str) -> list:
+    task_ids, item_ids, probs = load_candidates(conn, dataset_id)
+    if task_ids.shape[0] == 0:
+        return []
+    idx = select_arrays(
+        probs, k, strategy,
+        texts_for=lambda pool: load_texts(conn, dataset_id, task_ids[pool], item_ids[pool]),
+        ids=task_ids,
+    )
+    return task_ids[idx].tolist()
@@ -8,9 +8,31 @@ class DatasetOut(BaseModel):
     id: int
     name: str
     created_by: str
+    status: str = "active"
 
 class DatasetStatsOut(BaseModel):
     dataset_id: int
     total_tasks: int
     imported_tasks: int
     labeled_tasks: int
+
+class BulkAssignAnnotatorIn(BaseModel):
+    username: str
+    weight: float = 1.0
+    # 本次最多分给这个人多少条；None 表示不限
+    cap: Optional[int] = None
+
+class BulkAssignIn(BaseModel):
+    annotators: list[BulkAssignAnnotatorIn]
+    # 本次总共分多少条；None 表示把未分配的任务全部分完
+    limit: Optional[int] = None
+    # 只分指定状态的任务（例如 imported）
+    status: Optional[str] = None
+
+class PredictionIn(BaseModel):
+    item_id: int
+    # 各类别概率，如 [p_OK, p_NG]；同一个 dataset 的类别数要一致
+    probs: list[float]
+
+class PredictionsIn(BaseModel):
+    predictions: list[PredictionIn]
@@ -0,0 +1,88 @@
+"""
+标注一致性计算基准：合成 (task, 标注员, 标签) 票据，测 app.agreement.compute 的耗时。
+
+  python -m bench.bench_agreement --tasks 1000000 --annotators 50 --votes-per-task 3
+  python -m bench.bench_agreement --dataset-id 3     # 额外测从 annotation_votes 读票 + 计算（需要 DATABASE_URL）
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+from app import agreement
+
+
+def _synthetic(tasks: int, annotators: int, labels: int, votes: int, accuracy: float, seed: int) -> tuple:
+    rng = np.random.default_rng(seed)
+    truth = rng.integers(labels, size=tasks)
+    task_ids = np.repeat(np.arange(tasks, dtype=np.int64), votes)
+    # 每个 task 连续的 votes 个标注员，保证同一 task 内不重复
+    first = rng.integers(annotators, size=tasks)
+    a_idx = (np.repeat(first, votes) + np.tile(np.arange(votes), tasks)) % annotators
+    correct = rng.random(task_ids.shape[0]) < accuracy
+    l_idx = np.where(correct, np.repeat(truth, votes), rng.integers(labels, size=task_ids.shape[0]))
+    return task_ids, a_idx.astype(np.int64), l_idx.astype(np.int64)
+
+
+def _time(fn, repeat: int) -> tuple:
+    out, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out, result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Inter-annotator agreement benchmark")
+    ap.add_argument("--tasks", type=int, default=1_000_000)
+    ap.add_argument("--annotators", type=int, default=50)
+    ap.add_argument("--labels", type=int, default=2)
+    ap.add_argument("--votes-per-task", type=int, default=3)
+    ap.add_argument("--accuracy", type=float, default=0.8)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--dataset-id", type=int)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    if args.votes_per_task > args.annotators:
+        ap.error("--votes-per-task must be <= --annotators")
+
+    rows = []
+    arrays = _synthetic(args.tasks, args.annotators, args.labels, args.votes_per_task, args.accuracy, args.seed)
+    samples, result = _time(lambda: agreement.compute(*arrays, args.annotators, args.labels), args.repeat)
+    rows.append({"source": "synthetic", "votes": int(arrays[0].shape[0]),
+                 "p50_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2),
+                 "fleiss_kappa": result["dataset"]["fleiss_kappa"]})
+
+    if args.dataset_id:
+        from sqlalchemy import create_engine
+
+        engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+        with engine.connect() as conn:
+            def _db():
+                t, a, l, names, labels = agreement.load_votes(conn, args.dataset_id)
+                return agreement.compute(t, a, l, len(names), len(labels)), t.shape[0]
+
+            samples, (result, n) = _time(_db, args.repeat)
+        rows.append({"source": "db", "votes": int(n),
+                     "p50_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2),
+                     "fleiss_kappa": result["dataset"]["fleiss_kappa"]})
+
+    print(f"{'source':<11}{'votes':>11}{'p50 ms':>11}{'max ms':>11}{'fleiss':>10}", file=sys.stderr)
+    for r in rows:
+        print(f"{r['source']:<11}{r['votes']:>11}{r['p50_ms']:>11.2f}{r['max_ms']:>11.2f}{r['fleiss_kappa'] or 0:>10.4f}",
+              file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
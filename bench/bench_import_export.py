@@ -0,0 +1,256 @@
+"""
+import_dataset_to_ls / export_dataset_from_ls 吞吐基准（对着 bench.fake_ls 跑，不需要真 Label Studio）。
+
+每个 size、每个阶段都在独立子进程里执行，这样 peak RSS 只反映被测代码本身。
+需要 DATABASE_URL 指向一个可写的 Postgres（会建 dataset/tasks/jobs，结束后清理）。
+
+  python -m bench.bench_import_export --sizes 10000,100000,1000000
+  python -m bench.bench_import_export --sizes 10000 --latency-ms 2 --async-import --json out.json
+  python -m bench.bench_import_export --sizes 10000 --baseline base.json --tolerance 0.2   # 吞吐回退超过 20% 返回非 0
+
+吞吐按 job 结果里实际处理的条数计算；job 没有 success 或条数不等于 size 的运行记为失败，退出码非 0。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+import requests
+
+from bench.fake_ls import make_jwt, serve_in_thread
+
+PHASES = ("import", "export")
+
+
+# -----------------------------
+# 子进程：只跑被测的 celery task
+# -----------------------------
+def _rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_child(phase: str, job_id: int):
+    from app.celery_app import import_dataset_to_ls, export_dataset_from_ls
+
+    task = import_dataset_to_ls if phase == "import" else export_dataset_from_ls
+    base_rss = _rss_mb()
+    t0 = time.perf_counter()
+    result = task(job_id)
+    seconds = time.perf_counter() - t0
+    print(json.dumps({
+        "seconds": seconds,
+        "peak_rss_mb": _rss_mb(),
+        "base_rss_mb": base_rss,
+        "result": result,
+    }))
+
+
+# -----------------------------
+# 父进程：准备数据 + 调度子进程 + 汇总
+# -----------------------------
+def _engine():
+    from sqlalchemy import create_engine
+    from app.models import init_schema
+
+    engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+    init_schema(engine)
+    return engine
+
+
+def _create_dataset(engine, size: int) -> int:
+    from sqlalchemy.orm import Session
+    from app.models import Dataset
+
+    items = [{"id": i, "text": f"bench text {i} " + "lorem ipsum " * 4} for i in range(1, size + 1)]
+    with Session(engine) as db:
+        ds = Dataset(name=f"bench-{size}", items_json={"items": items}, created_by="bench")
+        db.add(ds)
+        db.commit()
+        return ds.id
+
+
+def _create_job(engine, dataset_id: int, job_type: str) -> int:
+    from sqlalchemy.orm import Session
+    from app.models import Job
+
+    with Session(engine) as db:
+        job = Job(type=job_type, status="queued", dataset_id=dataset_id, created_by="bench")
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def _cleanup(engine, dataset_id: int):
+    from sqlalchemy import delete
+    from sqlalchemy.orm import Session
+    from app.models import Dataset, Task, Job, AnnotationArchive
+
+    with Session(engine) as db:
+        db.execute(delete(AnnotationArchive).where(AnnotationArchive.dataset_id == dataset_id))
+        db.execute(delete(Task).where(Task.dataset_id == dataset_id))
+        db.execute(delete(Job).where(Job.dataset_id == dataset_id))
+        db.execute(delete(Dataset).where(Dataset.id == dataset_id))
+        db.commit()
+
+
+def _job_status(engine, job_id: int) -> str:
+    from sqlalchemy.orm import Session
+    from app.models import Job
+
+    with Session(engine) as db:
+        return db.get(Job, job_id).status
+
+
+# 每个阶段实际处理了多少条：import 看写回的 task 数，export 看从 LS 拉回的 task 数
+COUNT_KEYS = {"import": "imported", "export": "fetched"}
+
+
+def _ls_requests(base: str) -> dict:
+    return requests.get(base + "/_stats", timeout=10).json()
+
+
+def _run_phase(phase: str, job_id: int, env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "bench.bench_import_export", "--child", phase, "--job-id", str(job_id)],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{phase} child failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_bench(args) -> list:
+    server = serve_in_thread(
+        latency_ms=args.latency_ms,
+        error_rate=args.error_rate,
+        async_import=args.async_import,
+        import_delay=args.import_delay,
+        annotate_ratio=args.annotate_ratio,
+    )
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    env = dict(
+        os.environ,
+        LS_BASE_URL=base,
+        # worker 只校验“三段式”，fake LS 不验签
+        LS_API_TOKEN=make_jwt(exp_in=86400),
+        LS_PROJECT_ID="1",
+        # 子进程没有 broker，也不希望把一致性计算算进导出耗时
+        AGREEMENT_ON_EXPORT="false",
+    )
+    engine = _engine()
+    rows = []
+
+    for size in args.sizes:
+        requests.post(base + "/_reset", timeout=10)
+        dataset_id = _create_dataset(engine, size)
+        try:
+            for phase in PHASES:
+                before = _ls_requests(base)
+                job_id = _create_job(engine, dataset_id, f"{phase}_ls_bench")
+                out = _run_phase(phase, job_id, env)
+                after = _ls_requests(base)
+                result = out["result"] or {}
+                status = _job_status(engine, job_id)
+                # 吞吐按实际处理条数算；job 没成功或条数对不上都算失败（不参与基线比较）
+                count = int(result.get(COUNT_KEYS[phase]) or 0)
+                rows.append({
+                    "phase": phase,
+                    "size": size,
+                    "count": count,
+                    "job_status": status,
+                    "seconds": round(out["seconds"], 3),
+                    "items_per_s": round(count / out["seconds"], 1) if out["seconds"] > 0 else 0.0,
+                    "peak_rss_mb": round(out["peak_rss_mb"], 1),
+                    "rss_growth_mb": round(out["peak_rss_mb"] - out["base_rss_mb"], 1),
+                    "ls_requests": after.get("total", 0) - before.get("total", 0),
+                    "ok": bool(result.get("ok")) and status == "success" and count == size,
+                    "result": result,
+                })
+                print(_format_row(rows[-1]), file=sys.stderr)
+        finally:
+            if not args.keep:
+                _cleanup(engine, dataset_id)
+
+    server.shutdown()
+    return rows
+
+
+def _format_row(r: dict) -> str:
+    return (
+        f"{r['phase']:<7}{r['size']:>10}{r['seconds']:>11.3f}{r['items_per_s']:>13.1f}"
+        f"{r['peak_rss_mb']:>11.1f}{r['rss_growth_mb']:>11.1f}{r['ls_requests']:>11}  "
+        + ("ok" if r["ok"] else f"FAILED ({r['job_status']}, {r['count']}/{r['size']})")
+    )
+
+
+def _check_baseline(rows: list, baseline_path: str, tolerance: float) -> list:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = {(r["phase"], r["size"]): r for r in json.load(f)}
+    regressions = []
+    for r in rows:
+        if not r["ok"]:
+            regressions.append(
+                f"{r['phase']} size={r['size']}: run failed, job {r['job_status']}, {r['count']}/{r['size']} items"
+            )
+            continue
+        b = base.get((r["phase"], r["size"]))
+        if b and not b.get("ok", True):
+            continue
+        if b and r["items_per_s"] < b["items_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{r['phase']} size={r['size']}: {r['items_per_s']} items/s < baseline {b['items_per_s']}"
+            )
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import/export throughput benchmark against fake Label Studio")
+    ap.add_argument("--sizes", default="10000,100000,1000000",
+                    type=lambda s: [int(x) for x in s.split(",") if x.strip()])
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--async-import", action="store_true")
+    ap.add_argument("--import-delay", type=float, default=0.5)
+    ap.add_argument("--annotate-ratio", type=float, default=0.8)
+    ap.add_argument("--keep", action="store_true", help="keep bench datasets/tasks in the DB")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--baseline", help="compare items/s against a previous --json output")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--child", choices=PHASES, help=argparse.SUPPRESS)
+    ap.add_argument("--job-id", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        return run_child(args.child, args.job_id)
+
+    print(f"{'phase':<7}{'size':>10}{'seconds':>11}{'items/s':>13}{'peak MB':>11}{'growth MB':>11}{'LS reqs':>11}",
+          file=sys.stderr)
+    rows = run_bench(args)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    failed = [r for r in rows if not r["ok"]]
+    for r in failed:
+        print(f"FAILED {r['phase']} size={r['size']}: job {r['job_status']}, {r['count']}/{r['size']} items",
+              file=sys.stderr)
+
+    if args.baseline:
+        regressions = _check_baseline(rows, args.baseline, args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
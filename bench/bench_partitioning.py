@@ -0,0 +1,189 @@
+"""
+tasks 分区前后对比：同一份数据分别写进普通表（所有 dataset 共用一个堆和索引）和按 dataset_id LIST 分区的表，
+测单个 dataset 的统计扫描 / 主键点查 / 未分配任务池、热点 dataset 抖动后的 VACUUM，以及删除整个 dataset。
+表建在独立 schema（bench_part）里，不碰业务表；需要 DATABASE_URL。
+
+  python -m bench.bench_partitioning --rows 50000000 --datasets 100
+  python -m bench.bench_partitioning --rows 2000000 --datasets 20 --churn 3 --json part.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from sqlalchemy import create_engine, text
+
+SCHEMA = "bench_part"
+
+COLUMNS = """
+    id integer NOT NULL,
+    dataset_id integer NOT NULL,
+    item_id integer,
+    status varchar(20) NOT NULL,
+    assigned_to varchar(100),
+    label varchar(64),
+    created_at timestamp NOT NULL
+"""
+
+FILL_SQL = f"""
+INSERT INTO {SCHEMA}.flat
+SELECT g, 1 + (g - 1) / :per_ds, g,
+       CASE WHEN r < 0.3 THEN 'labeled' WHEN r < 0.9 THEN 'imported' ELSE 'new' END,
+       CASE WHEN r < 0.6 THEN 'ann_' || (g % 50) END,
+       CASE WHEN r < 0.3 THEN (ARRAY['OK', 'NG'])[1 + g % 2] END,
+       now() - (g % 10080) * interval '1 minute'
+FROM (SELECT g, random() AS r FROM generate_series(CAST(:lo AS integer), CAST(:hi AS integer)) AS g) s
+"""
+
+# 和业务代码里对应的查询（stats / 单条分配 / auto_assign 的候选池）
+QUERIES = {
+    "stats": "SELECT status, count(*) FROM {t} WHERE dataset_id = :d GROUP BY status",
+    "point": "SELECT * FROM {t} WHERE dataset_id = :d AND id = :id",
+    "pool": "SELECT id FROM {t} WHERE dataset_id = :d AND assigned_to IS NULL ORDER BY id LIMIT 500",
+}
+
+
+def _setup(conn, rows: int, datasets: int, chunk: int):
+    per_ds = -(-rows // datasets)
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.flat ({COLUMNS})"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.part ({COLUMNS}) PARTITION BY LIST (dataset_id)"))
+    for d in range(1, datasets + 1):
+        conn.execute(text(f"CREATE TABLE {SCHEMA}.part_d{d} PARTITION OF {SCHEMA}.part FOR VALUES IN ({d})"))
+    conn.commit()
+
+    t0 = time.perf_counter()
+    for lo in range(1, rows + 1, chunk):
+        hi = min(lo + chunk - 1, rows)
+        conn.execute(text(FILL_SQL), {"per_ds": per_ds, "lo": lo, "hi": hi})
+        conn.commit()
+        print(f"flat: {hi}/{rows} ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+    for d in range(1, datasets + 1):
+        conn.execute(text(f"INSERT INTO {SCHEMA}.part SELECT * FROM {SCHEMA}.flat WHERE dataset_id = :d"), {"d": d})
+        conn.commit()
+    print(f"part: copied ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+    # 索引和业务表一致：主键（分区表必须带上分区键）、dataset_id、未分配任务池的部分索引
+    for t, pk in (("flat", "id"), ("part", "id, dataset_id")):
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.{t} ADD PRIMARY KEY ({pk})"))
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{t} (dataset_id)"))
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{t} (dataset_id, id) WHERE assigned_to IS NULL"))
+        conn.execute(text(f"ANALYZE {SCHEMA}.{t}"))
+        conn.commit()
+    print(f"indexed ({time.perf_counter() - t0:.1f}s)", file=sys.stderr)
+
+
+def _churn(conn, table: str, dataset_id: int, rounds: int):
+    """
+    模拟热点 dataset 反复导入/导出：整 dataset 更新 rounds 次，留下死元组
+    """
+    for _ in range(rounds):
+        conn.execute(text(f"UPDATE {SCHEMA}.{table} SET label = label WHERE dataset_id = :d"), {"d": dataset_id})
+        conn.commit()
+
+
+def _time(conn, sql: str, params: dict, repeat: int) -> list:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) * 1000
+
+
+def _size(conn, table: str) -> int:
+    # 分区表父表本身没有存储，按叶子分区求和
+    return conn.execute(
+        text("SELECT COALESCE((SELECT sum(pg_total_relation_size(relid)) "
+             "FROM pg_partition_tree(CAST(:t AS regclass))), pg_total_relation_size(CAST(:t AS regclass)))"),
+        {"t": f"{SCHEMA}.{table}"},
+    ).scalar_one()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="tasks table partitioning benchmark")
+    ap.add_argument("--rows", type=int, default=50_000_000)
+    ap.add_argument("--datasets", type=int, default=100)
+    ap.add_argument("--chunk", type=int, default=1_000_000)
+    ap.add_argument("--churn", type=int, default=2, help="full updates of the hot dataset before measuring")
+    ap.add_argument("--delete-chunk", type=int, default=5000, help="rows per DELETE on the unpartitioned table")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--keep", action="store_true", help="keep the bench schema afterwards")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    if args.datasets < 3:
+        ap.error("--datasets must be >= 3")
+
+    engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+    per_ds = -(-args.rows // args.datasets)
+    hot, cold, victim = 1, args.datasets // 2, args.datasets
+    rows = []
+
+    with engine.connect() as conn:
+        _setup(conn, args.rows, args.datasets, args.chunk)
+
+        # 热点 dataset 抖动：普通表里死元组和其他 dataset 混在同一个堆和索引里
+        for t in ("flat", "part"):
+            before = _size(conn, t)
+            _churn(conn, t, hot, args.churn)
+            rows.append({"case": "churn_bloat_mb", "table": t,
+                         "value": round((_size(conn, t) - before) / 2 ** 20, 1)})
+
+        # 冷 dataset 上的查询：分区表只扫自己那一个分区
+        point_id = (cold - 1) * per_ds + per_ds // 2
+        for name, sql in QUERIES.items():
+            for t in ("flat", "part"):
+                samples = _time(conn, sql.format(t=f"{SCHEMA}.{t}"), {"d": cold, "id": point_id}, args.repeat)
+                rows.append({"case": f"{name}_p50_ms", "table": t, "value": round(statistics.median(samples), 3),
+                             "max_ms": round(max(samples), 3)})
+        conn.commit()
+
+        # VACUUM：普通表要扫全部 dataset，分区表只清热点分区
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        rows.append({"case": "vacuum_ms", "table": "flat",
+                     "value": round(_timed(lambda: conn.execute(text(f"VACUUM {SCHEMA}.flat"))), 1)})
+        rows.append({"case": "vacuum_ms", "table": "part",
+                     "value": round(_timed(lambda: conn.execute(text(f"VACUUM {SCHEMA}.part_d{hot}"))), 1)})
+
+        # 删除整个 dataset：分批 DELETE（同 app/lifecycle.delete_chunked） vs DETACH CONCURRENTLY + DROP
+        def _delete_flat():
+            sql = text(f"DELETE FROM {SCHEMA}.flat WHERE ctid = ANY(ARRAY("
+                       f"SELECT ctid FROM {SCHEMA}.flat WHERE dataset_id = :d LIMIT :n))")
+            while conn.execute(sql, {"d": victim, "n": args.delete_chunk}).rowcount:
+                pass
+
+        def _drop_part():
+            conn.execute(text(f"ALTER TABLE {SCHEMA}.part DETACH PARTITION {SCHEMA}.part_d{victim} CONCURRENTLY"))
+            conn.execute(text(f"DROP TABLE {SCHEMA}.part_d{victim}"))
+
+        rows.append({"case": "delete_dataset_ms", "table": "flat", "value": round(_timed(_delete_flat), 1)})
+        rows.append({"case": "delete_dataset_ms", "table": "part", "value": round(_timed(_drop_part), 1)})
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"rows={args.rows} datasets={args.datasets} rows/dataset={per_ds}", file=sys.stderr)
+    print(f"{'case':<20}{'flat':>14}{'partitioned':>14}", file=sys.stderr)
+    by_case = {}
+    for r in rows:
+        by_case.setdefault(r["case"], {})[r["table"]] = r["value"]
+    for case, v in by_case.items():
+        print(f"{case:<20}{v.get('flat', 0):>14}{v.get('part', 0):>14}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
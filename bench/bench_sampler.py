@@ -0,0 +1,119 @@
+"""
+auto_assign 主动学习采样基准：合成 N 个候选的模型概率，测各策略选 k 个的耗时。
+
+  python -m bench.bench_sampler --candidates 1000000 --k 500
+  python -m bench.bench_sampler --candidates 1000000 --classes 5 --budget-ms 1000 --json sampler.json
+  python -m bench.bench_sampler --dataset-id 3     # 额外测从 DB 读候选（需要 DATABASE_URL，可先用 bench.seed 造数）
+
+--budget-ms：任一策略的 p50 超过预算时返回非 0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import numpy as np
+
+from app import sampling
+
+STRATEGIES = [s for s in sampling.STRATEGIES if s != "id"]
+
+
+def _synthetic(n: int, classes: int, unscored: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Dirichlet(0.5) 比较接近真实模型输出：大部分很自信，少数接近均匀
+    probs = rng.dirichlet(np.full(classes, 0.5), size=n).astype(np.float32)
+    probs[rng.random(n) < unscored] = np.nan
+    return probs
+
+
+def _texts_for(pool: np.ndarray) -> list:
+    # 候选池里一半文本是重复模板，多样性选择应当避开它们扎堆
+    return [f"sample {i % 7} near duplicate text" if i % 2 else f"item {i} unique words {i * 7919 % 1000}"
+            for i in pool.tolist()]
+
+
+def _time(fn, repeat: int) -> list:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def run_synthetic(args) -> list:
+    probs = _synthetic(args.candidates, args.classes, args.unscored, args.seed)
+    rows = []
+    for strategy in STRATEGIES:
+        samples = _time(lambda: sampling.select_arrays(probs, args.k, strategy, texts_for=_texts_for), args.repeat)
+        rows.append({
+            "source": "synthetic",
+            "strategy": strategy,
+            "candidates": args.candidates,
+            "classes": args.classes,
+            "k": args.k,
+            "p50_ms": round(statistics.median(samples), 2),
+            "max_ms": round(max(samples), 2),
+        })
+        print(_format_row(rows[-1]), file=sys.stderr)
+    return rows
+
+
+def run_db(args) -> list:
+    from sqlalchemy import create_engine
+
+    engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+    rows = []
+    with engine.connect() as conn:
+        load = _time(lambda: sampling.load_candidates(conn, args.dataset_id), args.repeat)
+        n = sampling.load_candidates(conn, args.dataset_id)[0].shape[0]
+        rows.append({"source": "db", "strategy": "load", "candidates": n, "classes": None, "k": args.k,
+                     "p50_ms": round(statistics.median(load), 2), "max_ms": round(max(load), 2)})
+        print(_format_row(rows[-1]), file=sys.stderr)
+        for strategy in STRATEGIES:
+            samples = _time(lambda: sampling.select_task_ids(conn, args.dataset_id, args.k, strategy), args.repeat)
+            rows.append({"source": "db", "strategy": strategy, "candidates": n, "classes": None, "k": args.k,
+                         "p50_ms": round(statistics.median(samples), 2), "max_ms": round(max(samples), 2)})
+            print(_format_row(rows[-1]), file=sys.stderr)
+    return rows
+
+
+def _format_row(r: dict) -> str:
+    return f"{r['source']:<11}{r['strategy']:<13}{r['candidates']:>11}{r['k']:>7}{r['p50_ms']:>11.2f}{r['max_ms']:>11.2f}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Active-learning sampler benchmark")
+    ap.add_argument("--candidates", type=int, default=1_000_000)
+    ap.add_argument("--classes", type=int, default=2)
+    ap.add_argument("--k", type=int, default=500)
+    ap.add_argument("--unscored", type=float, default=0.05, help="fraction of candidates without model_probs")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--dataset-id", type=int, help="also benchmark loading candidates of this dataset from the DB")
+    ap.add_argument("--budget-ms", type=float, default=None)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    print(f"{'source':<11}{'strategy':<13}{'candidates':>11}{'k':>7}{'p50 ms':>11}{'max ms':>11}", file=sys.stderr)
+    rows = run_synthetic(args)
+    if args.dataset_id:
+        rows += run_db(args)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    if args.budget_ms is not None:
+        over = [r for r in rows if r["source"] == "synthetic" and r["p50_ms"] > args.budget_ms]
+        for r in over:
+            print(f"OVER BUDGET {r['strategy']}: {r['p50_ms']} ms > {args.budget_ms} ms", file=sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+冷启动基准：每轮起一个新的 Python 进程 import 入口模块（-X importtime），统计 wall time、
+入口模块累计 import 耗时、self 耗时最大的模块，以及重依赖（celery / requests / numpy / pyarrow）有没有被 API 进程带进来。
+
+  python -m bench.bench_startup --repeat 10
+  python -m bench.bench_startup --serve --budget-ms 1500 --json startup.json   # 额外测 uvicorn 起到 /health 返回 200
+
+入口：api = app.main（uvicorn），worker = app.celery_app（celery -A）。import 阶段不连数据库，
+DATABASE_URL 没设置时用一个不可达的地址即可。
+--budget-ms：任一入口的 p50 wall time 超过预算时返回非 0
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+
+ENTRIES = {"api": "app.main", "worker": "app.celery_app"}
+# API 进程不该加载的模块（只在 worker / 具体接口里按需加载）
+HEAVY = ("celery", "requests", "numpy", "pyarrow")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql+psycopg://bench@127.0.0.1:1/bench")
+    env.setdefault("JWT_SECRET", "bench")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def _parse(stderr: str) -> dict:
+    """
+    -X importtime 输出：self us | cumulative us | 模块（缩进表示层级）
+    """
+    mods = {}
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            mods[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return mods
+
+
+def _import_once(module: str, env: dict) -> tuple:
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                       env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - t0) * 1000
+    if p.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{p.stderr[-2000:]}")
+    return wall, _parse(p.stderr)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_once(env: dict, timeout: float) -> float:
+    """
+    uvicorn 进程启动到 /health 第一次返回 200 的耗时
+    """
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as r:
+                    if r.status == 200:
+                        return (time.perf_counter() - t0) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/health not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="API / worker cold-start benchmark")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=10, help="slowest modules (self time) to print per entry")
+    ap.add_argument("--serve", action="store_true", help="also time uvicorn start -> first /health 200")
+    ap.add_argument("--serve-timeout", type=float, default=30.0)
+    ap.add_argument("--budget-ms", type=float, default=None)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    env = _env()
+    rows = []
+    for entry, module in ENTRIES.items():
+        walls, cums, last = [], [], {}
+        for _ in range(args.repeat):
+            wall, mods = _import_once(module, env)
+            walls.append(wall)
+            cums.append(mods.get(module, (0, 0))[1] / 1000)
+            last = mods
+        top = sorted(((name, v[0] / 1000) for name, v in last.items()), key=lambda x: -x[1])[:args.top]
+        rows.append({
+            "entry": entry,
+            "module": module,
+            "wall_p50_ms": round(statistics.median(walls), 1),
+            "wall_max_ms": round(max(walls), 1),
+            "import_p50_ms": round(statistics.median(cums), 1),
+            "modules": len(last),
+            "heavy": [h for h in HEAVY if h in last],
+            "top_self_ms": [{"module": n, "ms": round(ms, 1)} for n, ms in top],
+        })
+
+    if args.serve:
+        samples = [_serve_once(env, args.serve_timeout) for _ in range(args.repeat)]
+        rows.append({"entry": "api_serve", "module": "uvicorn app.main:app",
+                     "wall_p50_ms": round(statistics.median(samples), 1), "wall_max_ms": round(max(samples), 1)})
+
+    print(f"{'entry':<11}{'wall p50':>10}{'wall max':>10}{'import':>10}{'modules':>9}  heavy", file=sys.stderr)
+    for r in rows:
+        print(f"{r['entry']:<11}{r['wall_p50_ms']:>10.1f}{r['wall_max_ms']:>10.1f}"
+              f"{r.get('import_p50_ms', 0):>10.1f}{r.get('modules', 0):>9}  {','.join(r.get('heavy', [])) or '-'}",
+              file=sys.stderr)
+    for r in rows:
+        if r.get("top_self_ms"):
+            print(f"\n{r['entry']} slowest modules (self ms):", file=sys.stderr)
+            for t in r["top_self_ms"]:
+                print(f"  {t['ms']:>8.1f}  {t['module']}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    if args.budget_ms is not None:
+        over = [r for r in rows if r["wall_p50_ms"] > args.budget_ms]
+        for r in over:
+            print(f"OVER BUDGET {r['entry']}: {r['wall_p50_ms']} ms > {args.budget_ms} ms", file=sys.stderr)
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
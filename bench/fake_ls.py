@@ -0,0 +1,334 @@
+"""
+离线 Label Studio 替身：只实现 worker 用到的接口，用来跑 import/export 的性能测试。
+
+  POST /api/token/refresh(/)                  refresh -> access
+  POST /api/projects/{pid}/import(/)          同步返回 task_ids，或 --async-import 时返回 {"import": id}
+  GET  /api/projects/{pid}/import/{id}        导入状态
+  GET  /api/projects/{pid}/tasks              任务列表（ordering=-id / page_size / page）
+  GET  /api/tasks/{id}                        任务详情（带 annotations）
+  GET  /api/projects/{pid}/export             全量导出（JSON 数组，流式输出）
+  GET  /_stats  POST /_reset                  请求计数 / 清空状态（测试用）
+
+用法：
+  python -m bench.fake_ls --port 8081 --latency-ms 5 --error-rate 0.01 --async-import
+"""
+import re
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+LABELS = ("OK", "NG")
+
+
+def make_jwt(exp_in: int = 300) -> str:
+    """
+    造一个“长得像 JWT”的 token（worker 只解析 payload 里的 exp，不校验签名）
+    """
+    def _b64(obj) -> str:
+        raw = json.dumps(obj).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    return ".".join([
+        _b64({"alg": "HS256", "typ": "JWT"}),
+        _b64({"token_type": "access", "exp": int(time.time()) + exp_in}),
+        "fakesignature",
+    ])
+
+
+class FakeLSState:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        async_import: bool = False,
+        import_delay: float = 0.5,
+        annotate_ratio: float = 0.8,
+        annotators: int = 3,
+        seed: int = 42,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.async_import = async_import
+        self.import_delay = import_delay
+        self.annotate_ratio = annotate_ratio
+        self.annotators = annotators
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            # 只存 text，annotations 按 task id 确定性生成，1M 任务也不会占太多内存
+            self.data = []
+            self.first_id = 1
+            self.imports = {}
+            self.next_import_id = 1
+            self.requests = Counter()
+
+    # ---- tasks ----
+    def add_tasks(self, payload: list) -> list:
+        with self.lock:
+            start = self.first_id + len(self.data)
+            for t in payload:
+                self.data.append(dict((t or {}).get("data") or {}))
+            return list(range(start, start + len(payload)))
+
+    def max_id(self) -> int:
+        return self.first_id + len(self.data) - 1
+
+    def has_task(self, tid: int) -> bool:
+        return self.first_id <= tid <= self.max_id()
+
+    def annotations(self, tid: int) -> list:
+        # 按 id 打散，同一个 task 每次返回一样的结果
+        h = (tid * 2654435761) & 0xFFFFFFFF
+        if (h % 1000) >= self.annotate_ratio * 1000:
+            return []
+        n = 1 + (h >> 10) % self.annotators
+        anns = []
+        for k in range(n):
+            label = LABELS[(h >> (12 + k)) & 1]
+            anns.append({
+                "id": tid * 10 + k,
+                "completed_by": 1 + (tid + k) % max(1, self.annotators),
+                "result": [{
+                    "from_name": "label",
+                    "to_name": "text",
+                    "type": "choices",
+                    "value": {"choices": [label]},
+                }],
+                "was_cancelled": False,
+                "lead_time": round(((h >> 4) % 600) / 10.0 + k, 1),
+                "created_at": "2025-01-01T00:00:00.000000Z",
+                "updated_at": "2025-01-01T00:00:00.000000Z",
+            })
+        return anns
+
+    def task_json(self, tid: int, project_id: int) -> dict:
+        return {
+            "id": tid,
+            "project": project_id,
+            "data": self.data[tid - self.first_id],
+            "annotations": self.annotations(tid),
+            "predictions": [],
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    state: FakeLSState = None
+    server_version = "FakeLabelStudio/0.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ---- helpers ----
+    def _send(self, code: int, obj=None):
+        body = json.dumps(obj if obj is not None else {}).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        return json.loads(self._body) if self._body else None
+
+    def _simulate(self, route: str) -> bool:
+        """
+        记录请求 + 注入延迟/错误；返回 False 表示已经回了错误响应
+        """
+        st = self.state
+        with st.lock:
+            st.requests[route] += 1
+            st.requests["total"] += 1
+            delay = st.latency_ms + (st.rng.random() * st.jitter_ms if st.jitter_ms else 0.0)
+            fail = st.error_rate > 0 and st.rng.random() < st.error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        if fail:
+            self._send(503, {"detail": "injected error"})
+            return False
+        return True
+
+    def _authorized(self) -> bool:
+        if (self.headers.get("Authorization") or "").startswith("Bearer "):
+            return True
+        self._send(401, {"detail": "Authentication credentials were not provided."})
+        return False
+
+    # ---- routing ----
+    ROUTES = [
+        ("POST", re.compile(r"^/api/token/refresh/?$"), "token_refresh"),
+        ("POST", re.compile(r"^/api/projects/(\d+)/import/?$"), "project_import"),
+        ("GET", re.compile(r"^/api/projects/(\d+)/import/(\d+)/?$"), "import_status"),
+        ("GET", re.compile(r"^/api/projects/(\d+)/tasks/?$"), "task_list"),
+        ("GET", re.compile(r"^/api/tasks/(\d+)/?$"), "task_detail"),
+        ("GET", re.compile(r"^/api/projects/(\d+)/export/?$"), "export"),
+    ]
+
+    def _dispatch(self, method: str):
+        # 先把 body 读完，注入错误时也不会让客户端遇到连接被重置
+        n = int(self.headers.get("Content-Length") or 0)
+        self._body = self.rfile.read(n) if n else b""
+        parsed = urlparse(self.path)
+        if parsed.path == "/_stats" and method == "GET":
+            with self.state.lock:
+                return self._send(200, dict(self.state.requests))
+        if parsed.path == "/_reset" and method == "POST":
+            self.state.reset()
+            return self._send(200, {"ok": True})
+
+        for m, pattern, route in self.ROUTES:
+            match = pattern.match(parsed.path)
+            if m == method and match:
+                if not self._simulate(route):
+                    return
+                if route != "token_refresh" and not self._authorized():
+                    return
+                return getattr(self, "_h_" + route)(match, parse_qs(parsed.query))
+        self._send(404, {"detail": "Not found."})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    # ---- handlers ----
+    def _h_token_refresh(self, match, qs):
+        body = self._read_json() or {}
+        if not body.get("refresh"):
+            return self._send(400, {"refresh": ["This field is required."]})
+        self._send(200, {"access": make_jwt()})
+
+    def _h_project_import(self, match, qs):
+        payload = self._read_json() or []
+        st = self.state
+        if not st.async_import:
+            ids = st.add_tasks(payload)
+            return self._send(201, {"task_count": len(ids), "task_ids": ids})
+
+        with st.lock:
+            import_id = st.next_import_id
+            st.next_import_id += 1
+            st.imports[import_id] = "in_progress"
+
+        def _finish():
+            time.sleep(st.import_delay)
+            st.add_tasks(payload)
+            with st.lock:
+                st.imports[import_id] = "completed"
+
+        threading.Thread(target=_finish, daemon=True).start()
+        self._send(201, {"import": import_id})
+
+    def _h_import_status(self, match, qs):
+        import_id = int(match.group(2))
+        with self.state.lock:
+            status = self.state.imports.get(import_id)
+        if status is None:
+            return self._send(404, {"detail": "Not found."})
+        self._send(200, {"id": import_id, "status": status})
+
+    def _h_task_list(self, match, qs):
+        project_id = int(match.group(1))
+        st = self.state
+        page_size = int((qs.get("page_size") or ["100"])[0])
+        page = int((qs.get("page") or ["1"])[0])
+        desc = (qs.get("ordering") or [""])[0] == "-id"
+        total = len(st.data)
+        if desc:
+            hi = st.max_id() - (page - 1) * page_size
+            ids = range(hi, max(st.first_id - 1, hi - page_size), -1)
+        else:
+            lo = st.first_id + (page - 1) * page_size
+            ids = range(lo, min(st.max_id() + 1, lo + page_size))
+        self._send(200, {"total": total, "results": [st.task_json(i, project_id) for i in ids]})
+
+    def _h_task_detail(self, match, qs):
+        tid = int(match.group(1))
+        if not self.state.has_task(tid):
+            return self._send(404, {"detail": "Not found."})
+        self._send(200, self.state.task_json(tid, 1))
+
+    def _h_export(self, match, qs):
+        # 大项目导出可能上百 MB：边生成边写（HTTP/1.0 无 Content-Length，以断开连接结束），不在内存里拼整个数组
+        project_id = int(match.group(1))
+        st = self.state
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+
+        buf = [b"["]
+        first = True
+        for tid in range(st.first_id, st.max_id() + 1):
+            t = st.task_json(tid, project_id)
+            if not t["annotations"]:
+                continue
+            buf.append((b"" if first else b",") + json.dumps(t).encode("utf-8"))
+            first = False
+            if len(buf) >= 1000:
+                self.wfile.write(b"".join(buf))
+                buf = []
+        buf.append(b"]")
+        self.wfile.write(b"".join(buf))
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, **state_kwargs) -> ThreadingHTTPServer:
+    """
+    port=0 时由系统分配端口（server.server_address[1]）
+    """
+    handler = type("FakeLSHandler", (Handler,), {"state": FakeLSState(**state_kwargs)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(**kwargs) -> ThreadingHTTPServer:
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-ls").start()
+    return server
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline Label Studio stand-in")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--async-import", action="store_true")
+    ap.add_argument("--import-delay", type=float, default=0.5)
+    ap.add_argument("--annotate-ratio", type=float, default=0.8)
+    ap.add_argument("--annotators", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    server = make_server(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        async_import=args.async_import,
+        import_delay=args.import_delay,
+        annotate_ratio=args.annotate_ratio,
+        annotators=args.annotators,
+    )
+    print(f"fake Label Studio listening on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+API 压测：按脚本化的流量配比（annotator / admin / mixed）并发打接口，输出 RPS 和 p50/p95/p99。
+先用 bench.seed 造数并生成 manifest。
+
+  python -m bench.loadtest --manifest seed.json --mix mixed --concurrency 32 --duration 60
+  python -m bench.loadtest --manifest seed.json --mix annotator --json annotator.json
+
+鉴权：
+- 设置了 JWT_SECRET（与 API 一致）时，直接为 manifest 里每个 annotator 签 token，模拟多用户
+- 否则只能用内置账号 admin / ann 登录
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+
+import requests
+
+# (name, weight, method, path 模板)；模板里的 {dataset_id} / {job_id} / {username} 运行时随机填
+MIXES = {
+    "annotator": [
+        ("annotator_tasks", 5, "GET", "/annotator/tasks?dataset_id={dataset_id}&status=imported&limit=50"),
+        ("annotator_stats", 3, "GET", "/annotator/stats?dataset_id={dataset_id}"),
+        ("annotator_stats_all", 1, "GET", "/annotator/stats"),
+    ],
+    "admin": [
+        ("dataset_stats", 4, "GET", "/datasets/{dataset_id}/stats"),
+        ("job", 4, "GET", "/jobs/{job_id}"),
+        ("auto_assign", 1, "POST", "/datasets/{dataset_id}/auto_assign?username={username}&count=20"),
+    ],
+}
+MIXES["mixed"] = MIXES["annotator"] * 3 + MIXES["admin"]
+
+
+def _percentile(sorted_vals: list, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # nearest-rank
+    k = max(0, min(len(sorted_vals) - 1, math.ceil(p / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[k]
+
+
+def _login(base: str, username: str, password: str) -> str:
+    r = requests.post(f"{base}/auth/login", json={"username": username, "password": password}, timeout=10)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def _tokens(base: str, annotators: list) -> tuple:
+    """
+    返回 (admin_token, {annotator: token})
+    """
+    if os.environ.get("JWT_SECRET"):
+        from app.auth import create_access_token
+
+        admin = create_access_token("admin", "admin")
+        return admin, {u: create_access_token(u, "annotator") for u in annotators}
+    return _login(base, "admin", "admin123"), {"ann": _login(base, "ann", "ann123")}
+
+
+class Worker(threading.Thread):
+    def __init__(self, base, ops, manifest, admin_token, ann_tokens, deadline, seed):
+        super().__init__(daemon=True)
+        self.base = base
+        self.ops = ops
+        self.weights = [o[1] for o in ops]
+        self.manifest = manifest
+        self.admin_token = admin_token
+        self.ann_tokens = ann_tokens
+        self.ann_names = list(ann_tokens)
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def run(self):
+        http = requests.Session()
+        m = self.manifest
+        while time.perf_counter() < self.deadline:
+            name, _, method, tmpl = self.rng.choices(self.ops, weights=self.weights)[0]
+            path = tmpl.format(
+                dataset_id=self.rng.choice(m["dataset_ids"]),
+                job_id=self.rng.choice(m["job_ids"]) if m.get("job_ids") else 1,
+                username=self.rng.choice(m["annotators"]),
+            )
+            if name.startswith("annotator"):
+                token = self.ann_tokens[self.rng.choice(self.ann_names)]
+            else:
+                token = self.admin_token
+
+            t0 = time.perf_counter()
+            try:
+                r = http.request(method, self.base + path, headers={"Authorization": f"Bearer {token}"}, timeout=30)
+                ok = r.status_code < 400
+            except requests.RequestException:
+                ok = False
+            self.samples[name].append(time.perf_counter() - t0)
+            if not ok:
+                self.errors[name] += 1
+
+
+def run(args) -> dict:
+    with open(args.manifest, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    base = args.base_url.rstrip("/")
+    admin_token, ann_tokens = _tokens(base, manifest["annotators"])
+    ops = MIXES[args.mix]
+
+    # 预热：建连接池、填缓存，不计入结果
+    if args.warmup > 0:
+        warm = [Worker(base, ops, manifest, admin_token, ann_tokens, time.perf_counter() + args.warmup, i)
+                for i in range(args.concurrency)]
+        for w in warm:
+            w.start()
+        for w in warm:
+            w.join()
+
+    started = time.perf_counter()
+    workers = [Worker(base, ops, manifest, admin_token, ann_tokens, started + args.duration, 1000 + i)
+               for i in range(args.concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    merged = defaultdict(list)
+    errors = defaultdict(int)
+    for w in workers:
+        for k, v in w.samples.items():
+            merged[k].extend(v)
+        for k, v in w.errors.items():
+            errors[k] += v
+    merged["ALL"] = [x for k in list(merged) for x in merged[k]]
+    errors["ALL"] = sum(errors.values())
+
+    report = {"mix": args.mix, "concurrency": args.concurrency, "duration_s": round(elapsed, 2), "endpoints": {}}
+    for name, vals in merged.items():
+        vals.sort()
+        report["endpoints"][name] = {
+            "requests": len(vals),
+            "errors": errors.get(name, 0),
+            "rps": round(len(vals) / elapsed, 1),
+            "p50_ms": round(_percentile(vals, 50) * 1000, 2),
+            "p95_ms": round(_percentile(vals, 95) * 1000, 2),
+            "p99_ms": round(_percentile(vals, 99) * 1000, 2),
+        }
+    return report
+
+
+def _print_report(report: dict):
+    print(f"mix={report['mix']} concurrency={report['concurrency']} duration={report['duration_s']}s")
+    print(f"{'endpoint':<22}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in sorted(report["endpoints"].items(), key=lambda kv: (kv[0] == "ALL", kv[0])):
+        print(f"{name:<22}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Scripted API load test")
+    ap.add_argument("--base-url", default=os.environ.get("API_BASE_URL", "http://localhost:8000"))
+    ap.add_argument("--manifest", default="seed.json")
+    ap.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--warmup", type=float, default=3.0)
+    ap.add_argument("--json", help="write the report to this file")
+    args = ap.parse_args(argv)
+
+    report = run(args)
+    _print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if report["endpoints"].get("ALL", {}).get("requests", 0) == 0:
+        print("no requests completed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+批量造数（压测用）：datasets / tasks / 分配 / 标注紧凑列 / 模型概率 / jobs，全部在 Postgres 里用 generate_series 生成，
+百万级行数也只需要几十秒；不走 ORM。
+
+  python -m bench.seed --datasets 10 --tasks-per-dataset 500000 --annotators 50 --manifest seed.json
+
+manifest 里记录生成的 dataset_id / job_id / annotator 名单，供 bench.loadtest 使用。
+annotator 名单包含默认账号 ann，其余为 ann_001、ann_002 ...
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from sqlalchemy import create_engine, text
+
+from app import partitioning
+from app.models import init_schema
+
+TASKS_SQL = text("""
+INSERT INTO tasks (dataset_id, ls_project_id, ls_task_id, item_id, item_text, status, assigned_to, assigned_at,
+                   created_at, label, annotator, annotated_at, lead_time, annotation_count, model_probs)
+SELECT
+    :dataset_id,
+    :project_id,
+    :ls_base + s.g,
+    s.g,
+    CASE WHEN s.g <= :n_items THEN 'seed text ' || s.g || ' ' || md5(s.g::text) END,
+    s.status,
+    CASE WHEN s.r_assign < :assigned_ratio THEN (CAST(:annotators AS text[]))[1 + (s.g % cardinality(CAST(:annotators AS text[])))] END,
+    CASE WHEN s.r_assign < :assigned_ratio THEN now() - (s.g % 1440) * interval '1 minute' END,
+    now() - (s.g % 10080) * interval '1 minute',
+    CASE WHEN s.status = 'labeled' THEN s.label END,
+    CASE WHEN s.status = 'labeled' THEN (1 + s.g % 50)::text END,
+    CASE WHEN s.status = 'labeled' THEN now() - (s.g % 720) * interval '1 minute' END,
+    CASE WHEN s.status = 'labeled' THEN round((s.r_assign * 60)::numeric, 1)::float8 END,
+    CASE WHEN s.status = 'labeled' THEN 1 END,
+    CASE WHEN s.r_prob < :scored_ratio THEN ARRAY[s.r_prob / :scored_ratio, 1 - s.r_prob / :scored_ratio]::real[] END
+FROM (
+    SELECT
+        g,
+        CASE WHEN r < :labeled_ratio THEN 'labeled' WHEN r < :imported_ratio THEN 'imported' ELSE 'new' END AS status,
+        CASE WHEN r_label < 0.5 THEN 'OK' ELSE 'NG' END AS label,
+        r_assign,
+        r_prob
+    FROM (
+        SELECT g, random() AS r, random() AS r_label, random() AS r_assign, random() AS r_prob
+        FROM generate_series(CAST(:lo AS integer), CAST(:hi AS integer)) AS g
+    ) raw
+) s
+""")
+
+DATASET_SQL = text("""
+INSERT INTO datasets (name, items_json, created_by, created_at)
+SELECT :name,
+       jsonb_build_object('items', COALESCE(jsonb_agg(jsonb_build_object('id', g, 'text', 'seed text ' || g || ' ' || md5(g::text)) ORDER BY g), '[]'::jsonb)),
+       'seed',
+       now()
+FROM generate_series(1, :n_items) AS g
+RETURNING id
+""")
+
+JOBS_SQL = text("""
+INSERT INTO jobs (type, status, dataset_id, message, created_by, created_at)
+SELECT (ARRAY['import_to_ls', 'export_from_ls'])[1 + g % 2], 'success', :dataset_id, 'seeded', 'seed', now()
+FROM generate_series(1, :n) AS g
+RETURNING id
+""")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Bulk-seed the Data Hub database for load testing")
+    ap.add_argument("--datasets", type=int, default=10)
+    ap.add_argument("--tasks-per-dataset", type=int, default=200000)
+    ap.add_argument("--items-per-dataset", type=int, default=None,
+                    help="size of items_json (default: same as tasks-per-dataset)")
+    ap.add_argument("--annotators", type=int, default=50)
+    ap.add_argument("--assigned-ratio", type=float, default=0.6)
+    ap.add_argument("--imported-ratio", type=float, default=0.9, help="imported + labeled")
+    ap.add_argument("--labeled-ratio", type=float, default=0.3)
+    ap.add_argument("--scored-ratio", type=float, default=0.95, help="tasks with model_probs")
+    ap.add_argument("--jobs-per-dataset", type=int, default=20)
+    ap.add_argument("--chunk", type=int, default=200000)
+    ap.add_argument("--seed", type=float, default=0.42)
+    ap.add_argument("--manifest", default="seed.json")
+    args = ap.parse_args(argv)
+
+    engine = create_engine(os.environ["DATABASE_URL"], pool_pre_ping=True)
+    init_schema(engine)
+
+    annotators = ["ann"] + [f"ann_{i:03d}" for i in range(1, args.annotators)]
+    n_items = args.items_per_dataset if args.items_per_dataset is not None else args.tasks_per_dataset
+    manifest = {"dataset_ids": [], "job_ids": [], "annotators": annotators}
+    t_start = time.perf_counter()
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT setseed(:s)"), {"s": args.seed})
+        for d in range(args.datasets):
+            ds_id = conn.execute(DATASET_SQL, {"name": f"seed-{d + 1}", "n_items": n_items}).scalar_one()
+            manifest["dataset_ids"].append(ds_id)
+            partitioning.ensure_partitions(conn, ds_id)
+            conn.commit()
+
+            for lo in range(1, args.tasks_per_dataset + 1, args.chunk):
+                hi = min(lo + args.chunk - 1, args.tasks_per_dataset)
+                conn.execute(TASKS_SQL, {
+                    "dataset_id": ds_id,
+                    "project_id": 1,
+                    "ls_base": d * args.tasks_per_dataset,
+                    "annotators": annotators,
+                    "assigned_ratio": args.assigned_ratio,
+                    "imported_ratio": args.imported_ratio,
+                    "labeled_ratio": args.labeled_ratio,
+                    "scored_ratio": args.scored_ratio,
+                    "lo": lo,
+                    "hi": hi,
+                    "n_items": n_items,
+                })
+                conn.commit()
+                print(f"dataset {ds_id}: {hi}/{args.tasks_per_dataset} tasks "
+                      f"({time.perf_counter() - t_start:.1f}s)", file=sys.stderr)
+
+            if args.jobs_per_dataset:
+                ids = conn.execute(JOBS_SQL, {"dataset_id": ds_id, "n": args.jobs_per_dataset}).scalars().all()
+                manifest["job_ids"].extend(ids)
+            conn.commit()
+
+        print("ANALYZE ...", file=sys.stderr)
+        conn.execute(text("ANALYZE datasets"))
+        conn.execute(text("ANALYZE tasks"))
+        conn.execute(text("ANALYZE jobs"))
+        conn.commit()
+
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    total = args.datasets * args.tasks_per_dataset
+    print(f"seeded {args.datasets} datasets / {total} tasks in {time.perf_counter() - t_start:.1f}s "
+          f"-> {args.manifest}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
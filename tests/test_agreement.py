@@ -0,0 +1,103 @@
+import itertools
+import math
+
+import numpy as np
+
+from app.agreement import fleiss_kappa, pairwise_cohen
+
+
+def _fleiss_reference(counts):
+    # 按定义逐 task 计算（每个 task 的票数可以不同）
+    n = [sum(row) for row in counts]
+    p_i = [(sum(c * c for c in row) - n_i) / (n_i * (n_i - 1)) for row, n_i in zip(counts, n)]
+    p_bar = sum(p_i) / len(p_i)
+    total = sum(n)
+    p_e = sum((sum(row[j] for row in counts) / total) ** 2 for j in range(len(counts[0])))
+    if p_e >= 1.0:
+        return math.nan
+    return (p_bar - p_e) / (1.0 - p_e)
+
+
+def _cohen_reference(votes, a, b, n_lab):
+    # votes: {(task, annotator): label}；只看两人都标过的 task
+    pairs = [(votes[t, a], votes[t, b]) for (t, x) in votes if x == a and (t, b) in votes]
+    if not pairs:
+        return math.nan, 0
+    n = len(pairs)
+    po = sum(1 for x, y in pairs if x == y) / n
+    pe = sum(
+        (sum(1 for x, _ in pairs if x == lab) / n) * (sum(1 for _, y in pairs if y == lab) / n)
+        for lab in range(n_lab)
+    )
+    if pe >= 1.0:
+        return math.nan, n
+    return (po - pe) / (1.0 - pe), n
+
+
+def _random_votes(rng, n_task, n_ann, n_lab, p_vote=0.6):
+    votes = {}
+    for t in range(n_task):
+        for a in range(n_ann):
+            if rng.random() < p_vote:
+                votes[t, a] = int(rng.integers(0, n_lab))
+    return votes
+
+
+def _assert_close(got, want):
+    if math.isnan(want):
+        assert math.isnan(got)
+    else:
+        assert math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-12)
+
+
+def test_fleiss_matches_reference():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n_task = int(rng.integers(1, 30))
+        n_lab = int(rng.integers(2, 5))
+        counts = rng.integers(0, 4, size=(n_task, n_lab))
+        counts = counts[counts.sum(axis=1) >= 2]
+        if counts.shape[0] == 0:
+            continue
+        _assert_close(fleiss_kappa(counts), _fleiss_reference(counts.tolist()))
+
+
+def test_fleiss_undefined_cases():
+    assert math.isnan(fleiss_kappa(np.empty((0, 2), dtype=np.int64)))
+    # 全部投同一个标签
+    assert math.isnan(fleiss_kappa(np.array([[3, 0], [2, 0]])))
+    # 每个 task 内完全一致，且不止用了一个标签
+    assert fleiss_kappa(np.array([[3, 0], [0, 3]])) == 1.0
+
+
+def test_pairwise_cohen_matches_reference():
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        n_task = int(rng.integers(1, 25))
+        n_ann = int(rng.integers(2, 5))
+        n_lab = int(rng.integers(2, 4))
+        votes = _random_votes(rng, n_task, n_ann, n_lab)
+        if not votes:
+            continue
+        # pairwise_cohen 要求 task 下标是 0..T-1 的稠密编号
+        _, t_idx = np.unique([t for t, _ in votes], return_inverse=True)
+        a_idx = np.array([a for _, a in votes], dtype=np.int64)
+        l_idx = np.array(list(votes.values()), dtype=np.int64)
+        kappa, shared = pairwise_cohen(t_idx.astype(np.int64), a_idx, l_idx, n_ann, n_lab)
+
+        for a, b in itertools.permutations(range(n_ann), 2):
+            want, n = _cohen_reference(votes, a, b, n_lab)
+            assert shared[a, b] == n
+            _assert_close(float(kappa[a, b]), want)
+
+
+def test_pairwise_cohen_symmetric_and_diagonal_empty():
+    t = np.array([0, 0, 1, 1, 2, 2], dtype=np.int64)
+    a = np.array([0, 1, 0, 1, 0, 1], dtype=np.int64)
+    lab = np.array([0, 0, 1, 1, 0, 1], dtype=np.int64)
+    kappa, shared = pairwise_cohen(t, a, lab, 2, 2)
+    assert shared.tolist() == [[0, 3], [3, 0]]
+    assert math.isnan(kappa[0, 0]) and math.isnan(kappa[1, 1])
+    _assert_close(float(kappa[0, 1]), float(kappa[1, 0]))
+    # po = 2/3，pe = 2/3 * 1/3 + 1/3 * 2/3 = 4/9
+    _assert_close(float(kappa[0, 1]), (2 / 3 - 4 / 9) / (1 - 4 / 9))
@@ -0,0 +1,41 @@
+from app.routers.datasets import _weighted_quotas
+from app.schemas import BulkAssignAnnotatorIn
+
+
+def _ann(weight=1.0, cap=None, name="a"):
+    return BulkAssignAnnotatorIn(username=name, weight=weight, cap=cap)
+
+
+def test_split_by_weight():
+    assert _weighted_quotas([_ann(3), _ann(1)], 100) == [75, 25]
+
+
+def test_largest_remainder_sums_to_total():
+    quotas = _weighted_quotas([_ann(1), _ann(1), _ann(1)], 10)
+    assert sum(quotas) == 10
+    assert sorted(quotas) == [3, 3, 4]
+
+
+def test_cap_redistributes_to_uncapped():
+    # 按权重 a 应得 50，封顶 10，剩下的 40 分给 b、c
+    quotas = _weighted_quotas([_ann(2, cap=10), _ann(1), _ann(1)], 100)
+    assert quotas[0] == 10
+    assert sum(quotas) == 100
+    assert quotas[1] == quotas[2] == 45
+
+
+def test_cascading_caps():
+    quotas = _weighted_quotas([_ann(1, cap=5), _ann(1, cap=20), _ann(1)], 60)
+    assert quotas == [5, 20, 35]
+
+
+def test_all_capped_leaves_remainder_unassigned():
+    assert _weighted_quotas([_ann(1, cap=3), _ann(1, cap=4)], 100) == [3, 4]
+
+
+def test_zero_cap_gets_nothing():
+    assert _weighted_quotas([_ann(5, cap=0), _ann(1)], 10) == [0, 10]
+
+
+def test_zero_total():
+    assert _weighted_quotas([_ann(1), _ann(2, cap=5)], 0) == [0, 0]
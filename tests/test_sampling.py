@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.sampling import UNSCORED, select_arrays, top_k
+
+
+def _reference(s, k, ids):
+    # 暴力参考：按 (分数降序, id 升序) 全排序取前 k
+    return sorted(range(s.shape[0]), key=lambda i: (-s[i], ids[i]))[:k]
+
+
+def test_top_k_breaks_ties_on_id():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        n = int(rng.integers(1, 40))
+        k = int(rng.integers(0, 45))
+        s = rng.choice([UNSCORED, 0.2, 0.5, 0.9], n).astype(np.float32)
+        ids = rng.permutation(1000)[:n]
+        assert top_k(s, k, ids).tolist() == _reference(s, min(k, n), ids)
+
+
+def test_top_k_defaults_to_index_order():
+    s = np.array([0.5, 0.9, 0.5, 0.5, 0.1], dtype=np.float32)
+    assert top_k(s, 3).tolist() == [1, 0, 2]
+    assert top_k(s, 0).tolist() == []
+
+
+def test_unscored_come_last_in_id_order():
+    # 行序和 id 不一致（load_candidates 的聚合不保证顺序）
+    ids = np.array([50, 10, 40, 20, 30, 60])
+    probs = np.array([
+        [np.nan, np.nan],
+        [np.nan, np.nan],
+        [0.6, 0.4],
+        [np.nan, np.nan],
+        [0.9, 0.1],
+        [np.nan, np.nan],
+    ], dtype=np.float32)
+    for strategy in ("uncertainty", "margin", "entropy", "diverse"):
+        idx = select_arrays(probs, 4, strategy, ids=ids)
+        assert ids[idx].tolist() == [40, 30, 10, 20], strategy
+
+
+def test_all_unscored_is_id_order():
+    ids = np.array([7, 3, 9, 1, 5])
+    probs = np.empty((5, 0), dtype=np.float32)
+    idx = select_arrays(probs, 3, "entropy", ids=ids)
+    assert ids[idx].tolist() == [1, 3, 5]
+
+
+def test_selection_is_deterministic_under_row_shuffle():
+    rng = np.random.default_rng(1)
+    n = 200
+    ids = np.arange(1, n + 1)
+    # 概率只取几个值，制造大量同分
+    p = rng.choice([0.5, 0.7, 0.9], n).astype(np.float32)
+    probs = np.stack([p, 1 - p], axis=1)
+    probs[rng.random(n) < 0.3] = np.nan
+    expected = ids[select_arrays(probs, 30, "margin", ids=ids)].tolist()
+    for _ in range(5):
+        perm = rng.permutation(n)
+        got = ids[perm][select_arrays(probs[perm], 30, "margin", ids=ids[perm])].tolist()
+        assert got == expected